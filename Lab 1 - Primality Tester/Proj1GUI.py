@@ -94,7 +94,7 @@ class Proj1GUI( QWidget ):
 
             # Output results from Miller-Rabin and compute the appropriate error bound, if necessary
             if ret_mr == 'prime':
-                prob = fermat.mprobability(k)
+                prob = fermat.mcertainty(n, k)
                 self.outputMR.setText( '<i>MR Result:</i> {:d} <b>is prime</b> with probability {:5.15f}'.format(n,prob) )
             else: # Should be 'composite'
                 self.outputMR.setText('<i>MR Result:</i> {:d} is <b>not prime</b>'.format(n))
@@ -0,0 +1,131 @@
+import contextlib
+import math
+import random
+
+import fermat
+import sieve
+
+# NumPy is optional, without it every value goes through the scalar path
+try:
+    import numpy as np
+    import montgomery64
+except ImportError:
+    np = None
+
+# Small primes used for table lookups and trial division
+SMALL_PRIME_LIMIT = 1000
+# Number of small primes tried lane by lane before the vectorized Miller-Rabin rounds
+VECTOR_TRIAL_PRIMES = 25
+
+SMALL_PRIMES = sieve.primes_below(SMALL_PRIME_LIMIT)
+SMALL_PRIME_SET = frozenset(SMALL_PRIMES)
+# One gcd against this product replaces trial division by every small prime
+SMALL_PRIME_PRODUCT = math.prod(SMALL_PRIMES)
+
+
+# Random witnesses cut from one large block of random bits instead of one randint call each
+class WitnessBuffer:
+    def __init__(self, rng=None, block_bits=1 << 16):
+        self.rng = rng or random.Random()
+        self.block_bits = block_bits
+        self.block = 0
+        self.available = 0
+
+    # Take the next nbits random bits, refilling the block when it runs out O(1) amortized
+    def take(self, nbits):
+        if nbits > self.available:
+            size = max(self.block_bits, nbits)
+            self.block = self.rng.getrandbits(size)
+            self.available = size
+        value = self.block & ((1 << nbits) - 1)
+        self.block >>= nbits
+        self.available -= nbits
+        return value
+
+    # Draw a witness in [2, n - 2], the extra 64 bits make the modulo bias negligible
+    def witness(self, n):
+        return 2 + self.take(n.bit_length() + 64) % (n - 3)
+
+
+# Scalar Miller-Rabin that reuses the shared tables and witness buffer O(k * n^3)
+def test_one(n, k, buffer, deterministic=None, stats=None):
+    if stats is not None:
+        stats.tests += 1
+    if n < SMALL_PRIME_LIMIT:
+        return n in SMALL_PRIME_SET
+    if math.gcd(n, SMALL_PRIME_PRODUCT) != 1:
+        return False
+
+    s, d = fermat.decompose(n)
+    bases = fermat.deterministic_bases(n, deterministic)
+    if bases is None:
+        bases = [buffer.witness(n) for _ in range(k)]
+    for i, a in enumerate(bases):
+        a %= n
+        if a == 0:
+            continue
+        if stats is not None:
+            stats.rounds += 1
+        if not fermat.miller_rabin_round(a, n, s, d):
+            if stats is not None:
+                stats.witness(i + 1)
+            return False
+    return True
+
+
+# Exact Miller-Rabin over a uint64 array of non-negative values O(log n) array passes
+# A fermat.Stats passed as stats counts one test per lane and the rounds the survivors of trial division run
+def vector_test(n, stats=None):
+    n = n.astype(np.uint64)
+    if stats is not None:
+        stats.tests += n.size
+    prime = n >= 2
+
+    # Small values are answered from the table, trial division clears most of the rest
+    small = n < SMALL_PRIME_LIMIT
+    prime[small] = np.isin(n[small], SMALL_PRIMES)
+    pending = prime & ~small
+    for p in SMALL_PRIMES[:VECTOR_TRIAL_PRIMES]:
+        pending &= n % np.uint64(p) != 0
+
+    # Survivors are odd and above SMALL_PRIME_LIMIT, which is what the Montgomery kernel needs
+    if pending.any():
+        pending[pending] = montgomery64.miller_rabin(n[pending], stats)
+
+    # Lanes that failed trial division or a round are composite, the rest are prime
+    return np.where(small, prime, pending)
+
+
+# Test every value with Miller-Rabin and return a compact array of verdicts, True meaning prime
+# Returns a NumPy bool array, or a bytearray of 0/1 when NumPy is not installed
+# A fermat.Stats passed as stats totals the operation counts of the whole batch
+def prime_test_many(values, k, deterministic=None, rng=None, stats=None):
+    if stats is None:
+        return test_many(values, k, deterministic, WitnessBuffer(rng), None)
+    with fermat.collecting(stats):
+        return test_many(values, k, deterministic, WitnessBuffer(rng), stats)
+
+
+def test_many(values, k, deterministic, buffer, stats):
+    phase = stats.phase if stats is not None else lambda name: contextlib.nullcontext()
+
+    if np is not None and isinstance(values, np.ndarray) and values.dtype.kind in 'iu':
+        values = values.ravel()
+        result = np.zeros(values.shape, dtype=bool)
+        # Negative lanes stay composite, every other lane of a 64-bit or narrower array goes through the vector path
+        vector = values >= 0
+        if deterministic is not False and vector.any():
+            with phase('vector'):
+                result[vector] = vector_test(values[vector], stats)
+        else:
+            vector[:] = False
+        with phase('scalar'):
+            for i in np.flatnonzero(~vector & (values >= 0)):
+                result[i] = test_one(int(values[i]), k, buffer, deterministic, stats)
+        return result
+
+    with phase('scalar'):
+        verdicts = bytearray(test_one(int(n), k, buffer, deterministic, stats) for n in values)
+    if np is None:
+        return verdicts
+    return np.frombuffer(verdicts, dtype=bool).copy()
@@ -0,0 +1,105 @@
+#!/usr/bin/python3
+
+import argparse
+import math
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Levels with fewer nodes than this run serially, pickling a few huge numbers costs more than it saves
+PARALLEL_MIN_NODES = 64
+# Pieces a parallel level is cut into, enough to keep every worker busy
+PARALLEL_CHUNKS = 64
+
+
+def multiply(pair):
+    return pair[0] * pair[1]
+
+
+def square_remainder(pair):
+    parent, node = pair
+    return parent % (node * node)
+
+
+# Apply fn to every item, across the pool when there is one and the level is wide enough
+def level_map(fn, items, executor):
+    if executor is None or len(items) < PARALLEL_MIN_NODES:
+        return [fn(item) for item in items]
+    chunksize = max(1, len(items) // PARALLEL_CHUNKS)
+    return list(executor.map(fn, items, chunksize=chunksize))
+
+
+# Build the product tree bottom up, levels[0] is the moduli and levels[-1] is their product
+# Time complexity is O(M(n) log n) where M(n) is the cost of multiplying n-bit numbers
+def product_tree(moduli, executor=None):
+    levels = [list(moduli)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        pairs = [(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        products = level_map(multiply, pairs, executor)
+        if len(level) % 2:
+            products.append(level[-1])  # An odd node out is carried up unchanged
+        levels.append(products)
+    return levels
+
+
+# Push the full product down the tree, reducing it mod the square of every node
+# Returns P mod N_i^2 for every modulus N_i, in the same order as the moduli
+def remainder_tree(levels, executor=None):
+    remainders = levels[-1]
+    for level in reversed(levels[:-1]):
+        pairs = [(remainders[i // 2], node) for i, node in enumerate(level)]
+        remainders = level_map(square_remainder, pairs, executor)
+    return remainders
+
+
+# Bernstein's batch GCD: gcd(N_i, product of every other modulus) for every N_i
+# Time complexity is O(M(n) log n) instead of the O(n^2) gcds of the pairwise approach
+def batch_gcd(moduli, workers=None):
+    moduli = list(moduli)
+    if len(moduli) < 2:
+        return [1] * len(moduli)
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers and workers > 1 else None
+    try:
+        levels = product_tree(moduli, executor)
+        remainders = remainder_tree(levels, executor)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # (P mod N^2) / N = (P / N) mod N, the product of every other modulus reduced mod N
+    return [math.gcd(n, r // n) for n, r in zip(moduli, remainders)]
+
+
+# Yield (index, modulus, factor) for every modulus that shares a factor with another one
+# A factor equal to the modulus means all of its factors are shared, for example a duplicate
+def shared_factors(moduli, workers=None):
+    moduli = list(moduli)
+    for i, (n, g) in enumerate(zip(moduli, batch_gcd(moduli, workers))):
+        if g != 1:
+            yield i, n, g
+
+
+# Read one modulus per line, decimal or 0x-prefixed hex, skipping blank lines
+def read_moduli(path):
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield int(line, 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find moduli that share a prime factor')
+    parser.add_argument('path', help='file with one modulus per line')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes for the wide levels of the trees')
+    args = parser.parse_args(argv)
+
+    # One line per vulnerable modulus: line number, shared factor, modulus
+    for i, n, g in shared_factors(read_moduli(args.path), args.workers):
+        sys.stdout.write('{:d}\t{:d}\t{:d}\n'.format(i + 1, g, n))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/python3
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+
+import fermat
+
+# Bit sizes every target is timed at
+BIT_SIZES = (64, 128, 256, 512, 1024, 2048, 4096, 8192)
+# Largest size each input class is generated at, finding big primes and Carmichael numbers dominates the run
+CLASS_MAX_BITS = {
+    'random_odd': 8192,
+    'prime': 2048,
+    'carmichael': 256,
+    'semiprime': 2048,
+}
+# Inputs generated per input class and bit size
+TRIALS = 5
+# Timed passes over the inputs, the fastest pass is reported
+REPEAT = 3
+# Rounds given to the Fermat and Miller-Rabin tests
+ROUNDS = 20
+# Relative slowdown against the baseline reported as a regression
+TOLERANCE = 0.10
+SEED = 312
+# Results the harness compares against unless told otherwise, regenerate it with --output on the regression host
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+
+# Random odd number of exactly bits bits, almost always composite
+def random_odd(bits, rng):
+    return rng.getrandbits(bits) | (1 << (bits - 1)) | 1
+
+
+def prime(bits, rng):
+    return fermat.random_prime(bits, rng=rng)
+
+
+# Chernick Carmichael number (6k + 1)(12k + 1)(18k + 1) of exactly bits bits, it fools every Fermat round
+def carmichael(bits, rng):
+    lowest = round((2 ** (bits - 1) / 1296) ** (1 / 3)) + 1
+    while True:
+        k = rng.randrange(lowest, lowest * 5 // 4)
+        while not all(fermat.run_baillie_psw(m) == 'prime' for m in (6 * k + 1, 12 * k + 1, 18 * k + 1)):
+            k += 1
+        n = (6 * k + 1) * (12 * k + 1) * (18 * k + 1)
+        if n.bit_length() == bits:
+            return n
+
+
+# Product of two primes of half the size each
+def semiprime(bits, rng):
+    while True:
+        n = prime(bits // 2, rng) * prime(bits - bits // 2, rng)
+        if n.bit_length() == bits:
+            return n
+
+
+INPUT_CLASSES = {
+    'random_odd': random_odd,
+    'prime': prime,
+    'carmichael': carmichael,
+    'semiprime': semiprime,
+}
+
+
+# Every timed function, called as target(n) with a number from an input class
+def targets():
+    found = {}
+    for name in fermat.MOD_EXP_ENGINES:
+        # Fermat's exponent n - 1 with a fixed base, the shape every test round has
+        found['mod_exp.' + name] = (lambda engine: lambda n: fermat.mod_exp(3, n - 1, n, engine))(name)
+    found['run_fermat'] = lambda n: fermat.run_fermat(n, ROUNDS)
+    found['run_miller_rabin'] = lambda n: fermat.run_miller_rabin(n, ROUNDS, deterministic=False)
+    for mode, test in fermat.TESTS.items():
+        if mode not in ('fermat', 'miller_rabin'):
+            found['run_' + mode] = lambda n, test=test: test(n, ROUNDS)
+    return found
+
+
+# Time REPEAT passes of target over the inputs and return the fastest time per call
+def time_target(target, inputs, repeat):
+    best = None
+    for _ in range(repeat):
+        t1 = time.perf_counter()
+        for n in inputs:
+            target(n)
+        elapsed = (time.perf_counter() - t1) / len(inputs)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+# The recursive engine needs one stack frame per bit of the exponent
+def too_deep(name, bits):
+    return name == 'mod_exp.recursive' and bits >= sys.getrecursionlimit() - 50
+
+
+# Check every engine against the builtin pow before timing anything
+def check_engines(inputs):
+    for n in inputs:
+        expected = pow(3, n - 1, n)
+        for name, engine in fermat.MOD_EXP_ENGINES.items():
+            if too_deep('mod_exp.' + name, n.bit_length()):
+                continue
+            if engine(3, n - 1, n) != expected:
+                raise AssertionError('{} disagrees with pow for n = {:d}'.format(name, n))
+
+
+def run(sizes, classes, trials, repeat, seed, log):
+    # Seed both the input generator and the witnesses the tests draw, so reruns time the same work
+    rng = random.Random(seed)
+    random.seed(seed)
+    timed = targets()
+    results = []
+
+    for input_class in classes:
+        for bits in sizes:
+            if bits > CLASS_MAX_BITS[input_class]:
+                continue
+            inputs = [INPUT_CLASSES[input_class](bits, rng) for _ in range(trials)]
+            check_engines(inputs)
+            for name, target in timed.items():
+                if too_deep(name, bits):
+                    continue
+                seconds = time_target(target, inputs, repeat)
+                results.append({'target': name, 'class': input_class, 'bits': bits, 'seconds': seconds})
+                log('{:<24}{:<12}{:>6d}{:>14.3f} ms'.format(name, input_class, bits, seconds * 1000))
+    return results
+
+
+# Settings that decide which inputs are timed and how, a baseline run with other values timed other work
+RUN_SETTINGS = ('seed', 'trials', 'repeat', 'rounds')
+
+
+# Settings on which a report and a baseline disagree, as (name, now, baseline) triples
+def mismatched_settings(report, baseline):
+    return [(name, report[name], baseline.get(name)) for name in RUN_SETTINGS if report[name] != baseline.get(name)]
+
+
+# Compare results against a baseline run and return the entries that slowed down past tolerance
+def compare(results, baseline, tolerance, log):
+    previous = {(r['target'], r['class'], r['bits']): r['seconds'] for r in baseline['results']}
+    regressions = []
+    for r in results:
+        before = previous.get((r['target'], r['class'], r['bits']))
+        if before is None:
+            continue
+        ratio = r['seconds'] / before
+        flag = ''
+        if ratio > 1 + tolerance:
+            regressions.append(dict(r, baseline=before, ratio=ratio))
+            flag = '  REGRESSION'
+        log('{:<24}{:<12}{:>6d}{:>10.2f}x{}'.format(r['target'], r['class'], r['bits'], ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the primality subsystem across bit sizes and input classes')
+    parser.add_argument('--sizes', type=int, nargs='+', default=BIT_SIZES)
+    parser.add_argument('--classes', nargs='+', choices=sorted(INPUT_CLASSES), default=list(INPUT_CLASSES))
+    parser.add_argument('--trials', type=int, default=TRIALS)
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', metavar='PATH', help='write the results as JSON, - for stdout')
+    parser.add_argument('--baseline', metavar='PATH', default=BASELINE,
+                        help='earlier --output file to compare against, skipped if it does not exist')
+    parser.add_argument('--no-baseline', action='store_true', help='skip the baseline comparison')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    # Progress goes to stderr so --output - stays valid JSON
+    def log(line):
+        print(line, file=sys.stderr)
+
+    results = run(args.sizes, args.classes, args.trials, args.repeat, args.seed, log)
+    report = {
+        'seed': args.seed,
+        'trials': args.trials,
+        'repeat': args.repeat,
+        'rounds': ROUNDS,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    elif args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+            f.write('\n')
+
+    # A run that just wrote the baseline has nothing to compare against
+    writing_baseline = args.output not in (None, '-') and os.path.abspath(args.output) == os.path.abspath(args.baseline)
+    if args.no_baseline or writing_baseline or not os.path.exists(args.baseline):
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    log('')
+    mismatched = mismatched_settings(report, baseline)
+    if mismatched:
+        log('Not comparing with {}, it was run with other settings: {}'.format(
+            args.baseline, ', '.join('{} {} here, {} there'.format(*m) for m in mismatched)))
+        return 0
+    log('Compared with {} (ratio = now / baseline)'.format(args.baseline))
+    regressions = compare(results, baseline, args.tolerance, log)
+    if regressions:
+        median = statistics.median(r['ratio'] for r in regressions)
+        log('{} regressions, median slowdown {:.2f}x'.format(len(regressions), median))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,130 @@
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fermat
+import sieve
+
+# Primes tried by trial division before any rho iterations
+TRIAL_LIMIT = 10000
+TRIAL_PRIMES = sieve.primes_below(TRIAL_LIMIT)
+# Rho steps whose differences are multiplied together before one gcd
+GCD_BATCH = 128
+
+
+# Raised when the time budget runs out, carrying the factorization found so far
+class FactorTimeout(Exception):
+    def __init__(self, n, factors, remaining):
+        super().__init__('Ran out of time factoring {:d}'.format(n))
+        self.factors = factors  # Prime factors found before the budget ran out
+        self.remaining = remaining  # Composite cofactors still unfactored
+
+
+# Divide out every prime below TRIAL_LIMIT O(p) for p primes in the table
+# Returns the small prime factors and the cofactor left over
+def trial_division(n):
+    factors = []
+    for p in TRIAL_PRIMES:
+        if p * p > n:
+            break
+        while n % p == 0:
+            factors.append(p)
+            n //= p
+    if 1 < n < TRIAL_LIMIT * TRIAL_LIMIT:
+        # Anything left below the square of the table limit has no smaller factor, so it is prime
+        factors.append(n)
+        n = 1
+    return factors, n
+
+
+# Brent's variant of Pollard rho with f(y) = y^2 + c mod n
+# Accumulates GCD_BATCH differences per gcd and backtracks one step at a time if the batch overshoots
+# Returns a nontrivial factor of the odd composite n, or None once the deadline passes
+# Expected time complexity is O(n^(1/4)) multiplications, where n is the value
+def pollard_brent(n, rng, deadline=None):
+    while True:
+        y, c = rng.randrange(1, n), rng.randrange(1, n)
+        g = r = q = 1
+        while g == 1:
+            x = y
+            # Advancing r steps without a gcd is checked against the budget every GCD_BATCH steps too
+            for k in range(0, r, GCD_BATCH):
+                if deadline is not None and time.monotonic() > deadline:
+                    return None
+                for _ in range(min(GCD_BATCH, r - k)):
+                    y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                # The budget is checked before every GCD_BATCH steps, advancing or batching,
+                # so it is never overshot by more than one batch and one replay of it
+                if deadline is not None and time.monotonic() > deadline:
+                    return None
+                ys = y  # Where this batch started, in case it has to be replayed
+                for _ in range(min(GCD_BATCH, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += GCD_BATCH
+            r *= 2
+
+        if g == n:
+            # The batch multiplied in every factor at once, replay it one gcd per step
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+        # Both factors collided on the same step, start over with a new constant
+
+
+# Split n into prime factors, returning the primes found and any composites left when time ran out
+def factor_partial(n, deadline=None, rng=None):
+    rng = rng or random.Random()
+    factors, n = trial_division(n)
+    pending = [n] if n > 1 else []
+    remaining = []
+
+    while pending:
+        m = pending.pop()
+        if fermat.run_baillie_psw(m) == 'prime':  # O(n^3)
+            factors.append(m)
+            continue
+        d = pollard_brent(m, rng, deadline)
+        if d is None:
+            remaining.append(m)
+            remaining.extend(pending)
+            break
+        pending.extend((d, m // d))
+
+    return sorted(factors), sorted(remaining)
+
+
+# Prime factorization of n in increasing order, with multiplicity
+# budget is in seconds, FactorTimeout carries the partial answer if it runs out
+def factor(n, budget=None):
+    if n < 1:
+        raise ValueError('Can only factor positive integers, got {:d}'.format(n))
+    deadline = time.monotonic() + budget if budget is not None else None
+    factors, remaining = factor_partial(n, deadline)
+    if remaining:
+        raise FactorTimeout(n, factors, remaining)
+    return factors
+
+
+# Worker side: factor one value with its own budget
+def factor_job(args):
+    n, budget = args
+    deadline = time.monotonic() + budget if budget is not None else None
+    return factor_partial(n, deadline)
+
+
+# Factor many values across worker processes, yielding (n, factors, remaining) in input order
+# remaining is empty unless that value ran out of budget
+def factor_many(values, budget=None, workers=None, chunksize=16):
+    values = list(values)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        jobs = ((n, budget) for n in values)
+        for n, (factors, remaining) in zip(values, executor.map(factor_job, jobs, chunksize=chunksize)):
+            yield n, factors, remaining
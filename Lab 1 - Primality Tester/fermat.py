@@ -1,23 +1,391 @@
+import collections
+import contextlib
+import functools
+import itertools
+import math
 import random
+import time
 
+import sieve
 
-def prime_test(n, k):
-    # This is the main function connected to the Test button. You don't need to touch it.
-    return run_fermat(n, k), run_miller_rabin(n, k)
 
+# Fixed witness sets that make Miller-Rabin exact for every n below the bound
+# 7 bases cover all 64-bit inputs, the first 13 primes cover n < 3.3e24
+DETERMINISTIC_BASES = (
+    (1 << 64, (2, 325, 9375, 28178, 450775, 9780504, 1795265022)),
+    (3317044064679887385961981, (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)),
+)
 
-def mod_exp(x, y, n):  # O(n^3)
-    # You will need to implement this function and change the return value.
+
+# prime_test answers n below this bound from the sieve's lookup table, 0 turns it off
+SIEVE_BOUND = 1 << 20
+
+# Odd candidates next_prime and random_prime sieve against small primes in one pass
+CANDIDATE_WINDOW = 2048
+# Odd primes used to sieve each candidate window
+CANDIDATE_PRIMES = sieve.primes_below(2048)[1:]
+# Primes Baillie-PSW divides by before its two probable prime tests
+TRIAL_PRIMES = sieve.primes_below(64)
+# Baillie-PSW has been checked against every n below this bound without a counterexample
+BPSW_VERIFIED_BOUND = 1 << 64
+# Certificates stop recursing below this bound, the verifier checks those primes with the sieve
+CERTIFICATE_SMALL = 1 << 20
+
+
+def prime_test(n, k, deterministic=None, mode='miller_rabin', stats=None):
+    # This is the main function connected to the Test button.
+    # mode picks the test reported next to Fermat, 'miller_rabin' or 'bpsw'
+    # deterministic=None picks the fixed witness sets automatically when n is small enough
+    # Passing a Stats object records operation counts into it and returns it as a third value
+    if stats is not None:
+        with collecting(stats):
+            return prime_test_phases(n, k, deterministic, mode, stats) + (stats,)
+    if n < SIEVE_BOUND:
+        # The table is exact, so both tests report its answer O(1)
+        result = 'prime' if sieve.is_prime(n) else 'composite'
+        return result, result
+    if mode == 'miller_rabin':
+        return run_fermat(n, k), run_miller_rabin(n, k, deterministic)
+    return run_fermat(n, k), TESTS[mode](n, k)
+
+
+# prime_test with the wall time of each test recorded as its own phase
+def prime_test_phases(n, k, deterministic, mode, stats):
+    if n < SIEVE_BOUND:
+        with stats.phase('sieve'):
+            result = 'prime' if sieve.is_prime(n) else 'composite'
+        return result, result
+    with stats.phase('fermat'):
+        ret_fermat = run_fermat(n, k)
+    with stats.phase(mode):
+        if mode == 'miller_rabin':
+            ret_second = run_miller_rabin(n, k, deterministic)
+        else:
+            ret_second = TESTS[mode](n, k)
+    return ret_fermat, ret_second
+
+
+# Operation counts for the tests run while it is being collected, see collecting()
+# Stats objects add together with +=, so one object can total a whole batch
+class Stats:
+    def __init__(self):
+        self.multiplications = 0  # Modular multiplications that are not squarings
+        self.squarings = 0
+        self.exponentiations = 0
+        self.rounds = 0  # Witnesses tried across every test
+        self.tests = 0
+        self.witness_rounds = collections.Counter()  # Round that found the witness -> how often
+        self.phase_times = collections.Counter()  # Phase name -> seconds
+
+    def __iadd__(self, other):
+        self.multiplications += other.multiplications
+        self.squarings += other.squarings
+        self.exponentiations += other.exponentiations
+        self.rounds += other.rounds
+        self.tests += other.tests
+        self.witness_rounds.update(other.witness_rounds)
+        self.phase_times.update(other.phase_times)
+        return self
+
+    # Add the wall time of the with block to the named phase
+    @contextlib.contextmanager
+    def phase(self, name):
+        t1 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_times[name] += time.perf_counter() - t1
+
+    def witness(self, round_number):
+        self.witness_rounds[round_number] += 1
+
+    def mul(self, mul):
+        def counted(a, b):
+            self.multiplications += 1
+            return mul(a, b)
+        return counted
+
+    def sqr(self, sqr):
+        def counted(a):
+            self.squarings += 1
+            return sqr(a)
+        return counted
+
+    def as_dict(self):
+        return {
+            'multiplications': self.multiplications,
+            'squarings': self.squarings,
+            'exponentiations': self.exponentiations,
+            'rounds': self.rounds,
+            'tests': self.tests,
+            'witness_rounds': dict(sorted(self.witness_rounds.items())),
+            'phase_times': dict(self.phase_times),
+        }
+
+
+# The Stats being collected into, None keeps every hook down to a single check
+_stats = None
+
+
+# Collect operation counts from every test run inside the with block into stats
+@contextlib.contextmanager
+def collecting(stats):
+    global _stats
+    previous, _stats = _stats, stats
+    try:
+        yield stats
+    finally:
+        _stats = previous
+
+
+# Run a single test and describe its answer as (verdict, mode, rounds, confidence)
+# mode is 'sieve' when the lookup table answered, rounds are the ones the test ran before it decided,
+# confidence is None when no bound is known
+def classify(n, k, mode='miller_rabin', deterministic=None):
+    return classify_witness(n, k, mode, deterministic)[0]
+
+
+# classify that also hands back the base the test found n composite with, as (result, witness)
+# witness is None for prime verdicts, for sieve answers and when the failing check has no base to show
+def classify_witness(n, k, mode='miller_rabin', deterministic=None):
+    if n < SIEVE_BOUND:
+        return ('prime' if sieve.is_prime(n) else 'composite', 'sieve', 0, 1.0), None
+
+    if mode == 'miller_rabin':
+        verdict, witness, rounds = miller_rabin_witness(n, k, deterministic)
+        confidence = mcertainty(n, k, deterministic)
+    elif mode == 'fermat':
+        verdict, witness, rounds = fermat_witness(n, k)
+        confidence = fprobability(k)
+    else:
+        # Baillie-PSW runs one strong base 2 round and, if n passes it, one strong Lucas test
+        verdict, witness, rounds = WITNESS_TESTS[mode](n, k)
+        confidence = 1.0 if n < BPSW_VERIFIED_BOUND else None
+
+    # A composite verdict always comes with a witness, so it is certain
+    if verdict == 'composite':
+        confidence = 1.0
+    return (verdict, mode, rounds, confidence), witness
+
+
+# Engine used by mod_exp when the caller does not pick one
+MOD_EXP_ENGINE = 'auto'
+# Moduli of at least this many bits go to the Montgomery engine under 'auto'
+# Below it one % n costs no more than Montgomery's two extra products, above it Karatsuba multiplication wins
+MONTGOMERY_BITS = 8192
+
+
+def mod_exp(x, y, n, engine=None):
+    # Dispatch to the selected exponentiation engine, defaulting to MOD_EXP_ENGINE
+    if _stats is not None:
+        return counted_mod_exp(x, y, n, engine or MOD_EXP_ENGINE, _stats)
+    return MOD_EXP_ENGINES[engine or MOD_EXP_ENGINE](x, y, n)
+
+
+# mod_exp with every multiplication and squaring counted into stats
+def counted_mod_exp(x, y, n, engine, stats):
+    stats.exponentiations += 1
+    if engine == 'auto':
+        engine = auto_engine(n)
+    if engine == 'recursive':
+        # One squaring per bit and one multiplication per 1 bit, counted without touching the recursion
+        stats.squarings += y.bit_length()
+        stats.multiplications += bin(y).count('1')
+        return recursive_mod_exp(x, y, n)
+    if n == 1:
+        return 0
+    if engine == 'montgomery' and n % 2 == 1:
+        context = montgomery(n)
+        result = sliding_window(context.to_montgomery(x), y, context.one,
+                                stats.mul(context.mul), stats.sqr(context.sqr))
+        return context.from_montgomery(result)
+    return sliding_window(x % n, y, 1, stats.mul(lambda a, b: a * b % n), stats.sqr(lambda a: a * a % n))
+
+
+def recursive_mod_exp(x, y, n):  # O(n^3)
+    # Original recursive engine, one stack frame per bit of y
     if y == 0:  # If you raise anything to the 0 power the answer is 1
         return 1  # O(1)
 
-    z = mod_exp(x, y // 2, n)  # Recursively set z and floor y
+    z = recursive_mod_exp(x, y // 2, n)  # Recursively set z and floor y
 
     if y % 2 == 0:  # Check if y is even
         return (z ** 2) % n  # O(n^2)
     else:  # y is odd
         return (x * (z ** 2)) % n  # O(n^2)
-    
+
+
+# Pick the sliding window width for an exponent of the given bit length O(1)
+def window_size(bits):
+    # Wider windows need a bigger table of odd powers but fewer multiplications
+    for size, limit in ((1, 8), (2, 24), (3, 80), (4, 240), (5, 672)):
+        if bits <= limit:
+            return size
+    return 6
+
+
+# Cut the exponent left to right into windows of at most k bits that end in a 1 bit O(n)
+# Returns (k, steps, tail), each step is (squarings, index): square that many times, then multiply by table[index],
+# and tail squarings finish off the zero bits after the last window
+# Cached because every round of a test raises to the same exponent
+@functools.lru_cache(maxsize=256)
+def window_plan(y):
+    bits = bin(y)[2:]  # One conversion instead of shifting y for every bit O(n)
+    k = window_size(len(bits))
+    steps = []
+    squarings = 0
+    i = 0
+    while i < len(bits):
+        if bits[i] == '0':
+            # Zero bits outside a window only square
+            squarings += 1
+            i += 1
+        else:
+            # Grow the window up to k bits and shrink it back to its last 1 bit
+            j = min(i + k, len(bits))
+            while bits[j - 1] == '0':
+                j -= 1
+            steps.append((squarings + j - i, int(bits[i:j], 2) >> 1))
+            squarings = 0
+            i = j
+    return k, tuple(steps), squarings
+
+
+# Sliding window exponentiation through mul(a, b) and sqr(a) callbacks O(n^3)
+# Only counted_mod_exp uses it, the engines below inline their reductions since a call per product costs more than
+# the product itself at small sizes
+def sliding_window(x, y, one, mul, sqr):
+    k, steps, tail = window_plan(y)
+
+    # Precompute the odd powers x, x^3, ..., x^(2^k - 1) O(2^k)
+    table = [x]
+    if k > 1:
+        x2 = sqr(x)
+        for _ in range((1 << (k - 1)) - 1):
+            table.append(mul(table[-1], x2))
+
+    result = one
+    for squarings, index in steps:
+        for _ in range(squarings):
+            result = sqr(result)
+        result = mul(result, table[index])
+    for _ in range(tail):
+        result = sqr(result)
+    return result
+
+
+def window_mod_exp(x, y, n):  # O(n^3)
+    # Iterative sliding window engine, no recursion and every product reduced mod n
+    if n == 1:
+        return 0
+    k, steps, tail = window_plan(y)
+    x %= n
+    table = [x]
+    if k > 1:
+        x2 = x * x % n
+        for _ in range((1 << (k - 1)) - 1):
+            table.append(table[-1] * x2 % n)
+
+    result = 1
+    for squarings, index in steps:
+        for _ in range(squarings):
+            result = result * result % n
+        result = result * table[index] % n
+    for _ in range(tail):
+        result = result * result % n
+    return result
+
+
+# Montgomery form for an odd modulus n, with R = 2^bits(n)
+# Building it costs one modular inverse, after which every reduction is a mask, a multiply and a shift
+class Montgomery:
+    def __init__(self, n):
+        if n % 2 == 0:
+            raise ValueError('Montgomery form needs an odd modulus')
+        self.n = n
+        self.bits = n.bit_length()
+        self.mask = (1 << self.bits) - 1
+        # n * n_prime = -1 mod R O(n^2)
+        self.n_prime = (-pow(n, -1, 1 << self.bits)) & self.mask
+        # R^2 mod n converts into Montgomery form with a single reduction
+        self.r2 = (1 << (2 * self.bits)) % n
+        self.one = (1 << self.bits) % n
+
+    # Compute t / R mod n for 0 <= t < n * R O(n^2)
+    def reduce(self, t):
+        m = ((t & self.mask) * self.n_prime) & self.mask
+        t = (t + m * self.n) >> self.bits
+        return t - self.n if t >= self.n else t
+
+    def to_montgomery(self, x):
+        return self.reduce((x % self.n) * self.r2)
+
+    def from_montgomery(self, x):
+        return self.reduce(x)
+
+    def mul(self, a, b):
+        return self.reduce(a * b)
+
+    def sqr(self, a):
+        return self.reduce(a * a)
+
+    # Compute x^y mod n with every product kept in Montgomery form O(n^3)
+    # The sliding window and the reductions are written out, as in window_mod_exp
+    def pow(self, x, y):
+        n, bits, mask, n_prime = self.n, self.bits, self.mask, self.n_prime
+        k, steps, tail = window_plan(y)
+        x = self.to_montgomery(x)
+        table = [x]
+        if k > 1:
+            x2 = self.sqr(x)
+            for _ in range((1 << (k - 1)) - 1):
+                table.append(self.mul(table[-1], x2))
+
+        result = self.one
+        for squarings, index in steps:
+            for _ in range(squarings):
+                t = result * result
+                t = (t + (((t & mask) * n_prime) & mask) * n) >> bits
+                result = t - n if t >= n else t
+            t = result * table[index]
+            t = (t + (((t & mask) * n_prime) & mask) * n) >> bits
+            result = t - n if t >= n else t
+        for _ in range(tail):
+            t = result * result
+            t = (t + (((t & mask) * n_prime) & mask) * n) >> bits
+            result = t - n if t >= n else t
+        return self.from_montgomery(result)
+
+
+# Reuse the Montgomery constants for a modulus across every round that tests it
+@functools.lru_cache(maxsize=64)
+def montgomery(n):
+    return Montgomery(n)
+
+
+def montgomery_mod_exp(x, y, n):  # O(n^3)
+    # Montgomery reduction only works for odd moduli, so even ones use the window engine
+    if n % 2 == 0 or n == 1:
+        return window_mod_exp(x, y, n)
+    return montgomery(n).pow(x, y)
+
+
+# Fastest engine for a modulus of n's size, Montgomery only pays off for large odd moduli
+def auto_engine(n):
+    return 'montgomery' if n % 2 == 1 and n.bit_length() >= MONTGOMERY_BITS else 'window'
+
+
+def auto_mod_exp(x, y, n):  # O(n^3)
+    return MOD_EXP_ENGINES[auto_engine(n)](x, y, n)
+
+
+MOD_EXP_ENGINES = {
+    'recursive': recursive_mod_exp,
+    'window': window_mod_exp,
+    'montgomery': montgomery_mod_exp,
+    'auto': auto_mod_exp,
+}
+
 
 def fprobability(k):
     # You will need to implement this function and change the return value.
@@ -29,6 +397,25 @@ def mprobability(k):
     return 1 - (0.25 ** k)  # Probability we are wrong, subtracted from 100%
 
 
+def mcertainty(n, k, deterministic=None):
+    # A fixed witness set answers exactly, otherwise fall back to the k-round error bound
+    if deterministic_bases(n, deterministic) is not None:
+        return 1.0
+    return mprobability(k)
+
+
+# Find the fixed witness set for n, or None to draw random witnesses O(1)
+def deterministic_bases(n, deterministic=None):
+    if deterministic is False:
+        return None
+    for bound, bases in DETERMINISTIC_BASES:
+        if n < bound:
+            return bases
+    if deterministic:
+        raise ValueError('No deterministic witness set covers {:d}'.format(n))
+    return None
+
+
 def run_fermat(n, k):  # O(n^4)
     # You will need to implement this function and change the return value, which should be
     # either 'prime' or 'composite'.
@@ -36,45 +423,369 @@ def run_fermat(n, k):  # O(n^4)
     # To generate random values for a, you will most likely want to use
     # random.randint(low,hi) which gives a random integer between low and
     #  hi, inclusive.
+    return fermat_witness(n, k)[0]
+
+
+# Fermat test returning (verdict, witness, rounds), the witness is the base a with a^(n-1) != 1 that failed n
+# and rounds are the bases tried, k for a prime verdict and fewer when a witness turns up early
+def fermat_witness(n, k):  # O(n^4)
+    if _stats is not None:
+        _stats.tests += 1
     if n == 1 or n == 0:  # O(1)
-        return 'composite'
+        return 'composite', None, 0
 
     for i in range(0, k):  # Here we assume k is equal to n bits
         a = random.randint(1, n - 1)  # O(1)
         mod = mod_exp(a, n - 1, n)  # O(n^3) for one loop
+        if _stats is not None:
+            _stats.rounds += 1
         if mod != 1:  # O(1)
-            return 'composite'  # Number is not prime
-    return 'prime'  # Number is prime
+            if _stats is not None:
+                _stats.witness(i + 1)
+            return 'composite', a, i + 1  # Number is not prime
+    return 'prime', None, k  # Number is prime
 
 
-def run_miller_rabin(n, k):  # O(n^5)
-    # You will need to implement this function and change the return value, which should be
-    # either 'prime' or 'composite'.
-    #
-    # To generate random values for a, you will most likely want to use
-    # random.randint(low,hi) which gives a random integer between low and
-    #  hi, inclusive.
-    if n == 1 or n == 0:  # O(1)
-        return 'composite'
-    elif n == 2:  # O(1)
-        return 'prime'
+# Write n - 1 as 2^s * d with d odd, once per n O(n)
+def decompose(n):
+    d = n - 1
+    s = (d & -d).bit_length() - 1  # Number of trailing zero bits
+    return s, d >> s
 
-    for i in range(0, k):  # Here we assume k is equal to n bits
-        a = random.randint(1, n - 1)  # O(1)
-        exp = n - 1  # O(n)
-        mod = 1  # O(1)
 
-        while mod == 1:
-            if exp == 1 or exp == 0:  # If the exponent is 0 or 1 break out of the loop
-                break
-            mod = mod_exp(a, exp, n)  # O(n^4)
-            exp = exp // 2  # Cut the exponent in half and floor it
+# One strong probable prime round for witness a, given n - 1 = 2^s * d O(n^3)
+def miller_rabin_round(a, n, s, d):
+    x = mod_exp(a, d, n)  # The only full exponentiation in the round
+    if x == 1 or x == n - 1:
+        return True
+
+    # Square up to s - 1 more times looking for n - 1 O(s * n^2)
+    for _ in range(s - 1):
+        x = x * x % n
+        if _stats is not None:
+            _stats.squarings += 1
+        if x == n - 1:
+            return True
+        if x == 1:  # A nontrivial square root of 1 proves n composite
+            return False
+    return False
+
+
+def run_miller_rabin(n, k, deterministic=None):  # O(k * n^3)
+    # Returns either 'prime' or 'composite'
+    return miller_rabin_witness(n, k, deterministic)[0]
+
+
+# Miller-Rabin returning (verdict, witness, rounds), the witness is the base that proved n composite,
+# 2 for even n, and rounds are the bases tried before the verdict, bases that are multiples of n not counted
+def miller_rabin_witness(n, k, deterministic=None):  # O(k * n^3)
+    if _stats is not None:
+        _stats.tests += 1
+    if n < 2:  # O(1)
+        return 'composite', None, 0
+    elif n < 4:  # 2 and 3 are prime O(1)
+        return 'prime', None, 0
+    elif n % 2 == 0:  # O(1)
+        return 'composite', 2, 0
+
+    # Decompose n - 1 once and share it across all k witnesses
+    s, d = decompose(n)
+
+    bases = deterministic_bases(n, deterministic)
+    if bases is not None:
+        # The fixed set replaces the k random rounds and makes the answer exact
+        witnesses = (a % n for a in bases)
+    else:
+        witnesses = (random.randint(2, n - 2) for _ in range(k))  # O(1) each
+
+    rounds = 0
+    for i, a in enumerate(witnesses):  # Here we assume k is equal to n bits
+        if a == 0:  # A fixed base that is a multiple of n says nothing
+            continue
+        rounds += 1
+        if _stats is not None:
+            _stats.rounds += 1
+        if not miller_rabin_round(a, n, s, d):  # O(n^3)
+            if _stats is not None:
+                _stats.witness(i + 1)
+            return 'composite', a, rounds  # Number is not prime
+    return 'prime', None, rounds  # Number is prime
+
+
+# Find a base that proves n composite, 2 for even n, or None if k rounds find none O(k * n^3)
+def composite_witness(n, k=20, deterministic=None):
+    if n < 4:
+        return None
+    if n % 2 == 0:
+        return 2
+    s, d = decompose(n)
+    bases = deterministic_bases(n, deterministic)
+    if bases is None:
+        bases = [random.randint(2, n - 2) for _ in range(k)]
+    for a in bases:
+        a %= n
+        if a != 0 and not miller_rabin_round(a, n, s, d):
+            return a
+    return None
+
+
+# Jacobi symbol (a/n) for odd n > 0 O(n^2)
+def jacobi(a, n):
+    a %= n
+    result = 1
+    while a != 0:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a  # Quadratic reciprocity
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+
+# Selfridge's method A: first D in 5, -7, 9, -11, ... with (D/n) = -1, or None if n has a factor O(n^2)
+def selfridge_d(n):
+    d = 5
+    while True:
+        j = jacobi(d, n)
+        if j == -1:
+            return d
+        if j == 0 and abs(d) != n:
+            return None
+        d = -d - 2 if d > 0 else -d + 2
+
+
+# Halve x mod odd n O(n)
+def half_mod(x, n):
+    x %= n
+    return (x + n) // 2 if x % 2 else x // 2
+
+
+# Strong Lucas probable prime test with P = 1, Q = (1 - D) / 4 O(n^3)
+def strong_lucas(n, d):
+    p, q = 1, (1 - d) // 4
+    s, k = decompose(n + 2)  # n + 1 = 2^s * k, decompose subtracts the 1
+
+    # Climb to U_k, V_k and Q^k one bit of k at a time, doubling and optionally stepping by one
+    u, v, qk = 1, p, q % n
+    for bit in bin(k)[3:]:
+        u, v = u * v % n, (v * v - 2 * qk) % n
+        qk = qk * qk % n
+        if bit == '1':
+            u, v = half_mod(p * u + v, n), half_mod(d * u + p * v, n)
+            qk = qk * q % n
 
-            if mod != -1 and mod != 1:  # Check the result of modular exponentiation
-                mod = mod - n  # Adjust accordingly
+    if u == 0 or v == 0:
+        return True
+    # V_2k = V_k^2 - 2 Q^k, looking for a zero in the next s - 1 doublings
+    for _ in range(s - 1):
+        v = (v * v - 2 * qk) % n
+        if v == 0:
+            return True
+        qk = qk * qk % n
+    return False
 
-            if exp % 2 != 0:  # Check to see if the exponent is even or odd and break accordingly
+
+def run_baillie_psw(n, k=None):  # O(n^3)
+    # One strong base 2 round plus one strong Lucas test, k is ignored because the cost is fixed
+    return baillie_psw_witness(n, k)[0]
+
+
+# Baillie-PSW returning (verdict, witness, rounds), the witness is a small prime factor or 2 when the base 2
+# round fails n and None when only the square check or the Lucas test did, rounds count the base 2 round and
+# the Lucas test as one each, none when trial division decided
+def baillie_psw_witness(n, k=None):  # O(n^3)
+    if _stats is not None:
+        _stats.tests += 1
+    if n < 2:
+        return 'composite', None, 0
+    for p in TRIAL_PRIMES:  # Cheap trial division also covers tiny n
+        if n % p == 0:
+            return ('prime', None, 0) if n == p else ('composite', p, 0)
+
+    s, d = decompose(n)
+    if _stats is not None:
+        _stats.rounds += 1
+    if not miller_rabin_round(2, n, s, d):  # O(n^3)
+        if _stats is not None:
+            _stats.witness(1)
+        return 'composite', 2, 1
+    if math.isqrt(n) ** 2 == n:  # Perfect squares never have (D/n) = -1
+        return 'composite', None, 1
+    d = selfridge_d(n)
+    if _stats is not None:
+        _stats.rounds += 1
+    if d is None or not strong_lucas(n, d):  # O(n^3)
+        if _stats is not None:
+            _stats.witness(2)
+        return 'composite', None, 2
+    return 'prime', None, 2
+
+
+# Pocklington certificate for the prime n, or None if n - 1 cannot be factored far enough
+# The certificate is (n, ((q, e, a, certificate for q), ...)) where q^e divides n - 1,
+# the q^e multiply to more than sqrt(n) and each a proves its q with Pocklington's criterion
+# Primes below CERTIFICATE_SMALL get an empty factor list, like a Pratt tree's leaves
+def prime_certificate(n, budget=None):
+    if n < CERTIFICATE_SMALL:
+        return (n, ()) if sieve.is_prime(n) else None
+
+    import factor  # Imported here because factor imports this module
+    deadline = time.monotonic() + budget if budget is not None else None
+    primes, remaining = factor.factor_partial(n - 1, deadline)
+
+    factors = []
+    covered = 1
+    # The largest factors shrink the unfactored part fastest
+    for q in sorted(set(primes), reverse=True):
+        if covered * covered > n:
+            break
+        a = pocklington_base(n, q)
+        if a is None:
+            return None  # Some base failed Fermat's test, so n is not prime
+        sub = prime_certificate(q, None if deadline is None else max(0.0, deadline - time.monotonic()))
+        if sub is None:
+            continue
+        e = primes.count(q)
+        factors.append((q, e, a, sub))
+        covered *= q ** e
+
+    if covered * covered <= n:
+        return None
+    return n, tuple(factors)
+
+
+# Smallest base a with a^(n-1) = 1 and gcd(a^((n-1)/q) - 1, n) = 1, or None if a^(n-1) != 1 O(n^3)
+def pocklington_base(n, q):
+    for a in itertools.count(2):
+        if mod_exp(a, n - 1, n) != 1:
+            return None
+        if math.gcd(mod_exp(a, (n - 1) // q, n) - 1, n) == 1:
+            return a
+
+
+# Check a certificate from prime_certificate, two mod_exp calls per prime factor at each level
+# Certificates come from whoever sent them, so anything malformed is rejected rather than raised on
+def verify_certificate(certificate):
+    try:
+        return check_certificate(certificate)
+    except (TypeError, ValueError):
+        return False
+
+
+def check_certificate(certificate):
+    n, factors = certificate
+    if not isinstance(n, int) or n < 2:
+        return False
+    if n < CERTIFICATE_SMALL:
+        return sieve.is_prime(n)
+
+    covered = 1
+    previous = None
+    for q, e, a, sub in factors:
+        # Primes come strictly decreasing as prime_certificate lists them, so no q is counted twice
+        if previous is not None and q >= previous:
+            return False
+        previous = q
+        # q^e has to divide n - 1, so e above the bit length of n is rejected before the power is taken
+        if q < 2 or not 1 <= e <= n.bit_length() or sub[0] != q or (n - 1) % (q ** e) != 0:
+            return False
+        if mod_exp(a, n - 1, n) != 1:
+            return False
+        if math.gcd(mod_exp(a, (n - 1) // q, n) - 1, n) != 1:
+            return False
+        if not check_certificate(sub):
+            return False
+        covered *= q ** e
+
+    if (n - 1) % covered != 0:
+        return False
+    # Pocklington: every prime factor of n is 1 mod the covered part, so covered > sqrt(n) proves n prime
+    return covered * covered > n
+
+
+# Flag the odd numbers start, start + 2, ... that have no small prime factor
+# Time complexity is O(w log log p) for a window of w candidates and primes up to p
+def candidate_window(start, size=CANDIDATE_WINDOW):
+    flags = bytearray([1]) * size
+    last = start + 2 * (size - 1)
+    for p in CANDIDATE_PRIMES:
+        # First odd multiple of p in the window, never p itself
+        first = max(p * p, start + (-start) % p)
+        if first % 2 == 0:
+            first += p
+        if first > last:
+            continue
+        index = (first - start) // 2
+        flags[index::p] = bytes(len(range(index, size, p)))
+    return flags
+
+
+# Yield the odd numbers from start upward that survive the small prime sieve, window by window
+def sieved_candidates(start):
+    start |= 1
+    while True:
+        flags = candidate_window(start)
+        for i in itertools.compress(range(len(flags)), flags):
+            yield start + 2 * i
+        start += 2 * len(flags)
+
+
+# Return the first candidate Miller-Rabin accepts, splitting rounds across worker processes if asked
+def first_prime(candidates, k, workers=None):
+    if workers is None or workers <= 1:
+        for n in candidates:
+            if run_miller_rabin(n, k) == 'prime':  # O(k * n^3)
+                return n
+        return None
+
+    import scanner  # Imported here because scanner imports this module
+    tested, pending = itertools.tee(candidates)
+    verdicts = scanner.scan_batch(pending, k, chunk_size=1, workers=workers)
+    try:
+        for n, verdict in zip(tested, verdicts):
+            if verdict == 'prime':
+                return n
+        return None
+    finally:
+        verdicts.close()  # Shuts the pool down once the in-flight candidates finish
+
+
+# Smallest prime greater than n
+def next_prime(n, k=20, workers=None):
+    if n < 2:
+        return 2
+    return first_prime(sieved_candidates(n + 1 + n % 2), k, workers)
+
+
+# Uniform odd starting points of exactly bits bits, each followed by its sieved window
+def random_candidates(bits, rng):
+    while True:
+        start = rng.getrandbits(bits) | (1 << (bits - 1)) | 1
+        for n in itertools.islice(sieved_candidates(start), CANDIDATE_WINDOW):
+            if n.bit_length() > bits:
                 break
-        if mod != -1 and mod != 1:  # Finally, if our result is not 1 or -1, the number is not prime
-            return 'composite'  # Number is not prime
-    return 'prime'  # Number is prime
+            yield n
+
+
+# Random prime with exactly bits bits
+def random_prime(bits, k=20, workers=None, rng=random):
+    if bits < 2:
+        raise ValueError('There are no primes with fewer than 2 bits')
+    return first_prime(random_candidates(bits, rng), k, workers)
+
+
+# Primality tests selectable by name, each called as test(n, k)
+TESTS = {
+    'fermat': run_fermat,
+    'miller_rabin': run_miller_rabin,
+    'bpsw': run_baillie_psw,
+}
+# The same tests returning (verdict, witness, rounds)
+WITNESS_TESTS = {
+    'fermat': fermat_witness,
+    'miller_rabin': miller_rabin_witness,
+    'bpsw': baillie_psw_witness,
+}
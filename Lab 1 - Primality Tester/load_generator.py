@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+
+import argparse
+import asyncio
+import collections
+import random
+import statistics
+import time
+
+import prime_server
+
+# Checks to run against a spawned server after changing prime_server or the tests it calls, shown by --help
+CHECKS = '''checks:
+  load_generator.py --spawn
+      Small numbers, micro-batching has to keep up with many pipelined clients
+  load_generator.py --spawn --bits 4096 --connections 4 --requests 25 --depth 2
+      Large numbers, batches are cut by size so they spread over the pool, no answer should be a timeout
+  load_generator.py --spawn --bits 3072 --connections 1 --requests 256 --depth 256
+      A burst past what the pool answers in time, late requests time out without holding up the rest
+'''
+
+
+# Percentile of sorted values by nearest rank
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# One pipelined client: keeps up to depth requests outstanding and records each round trip
+async def client(open_connection, numbers, depth, latencies, verdicts):
+    reader, writer = await open_connection()
+    window = asyncio.Semaphore(depth)
+    sent = collections.deque()
+
+    async def send():
+        for n in numbers:
+            await window.acquire()
+            sent.append(time.perf_counter())
+            writer.write(b'%d\n' % n)
+            await writer.drain()
+
+    async def receive():
+        for _ in numbers:
+            line = await reader.readline()
+            if not line:
+                raise ConnectionError('Server closed the connection early')
+            latencies.append(time.perf_counter() - sent.popleft())
+            verdicts[line.split(b'\t')[1].decode()] += 1
+            window.release()
+
+    await asyncio.gather(send(), receive())
+    writer.close()
+    await writer.wait_closed()
+
+
+async def generate(args):
+    handles = None
+    host, port = args.host, args.port
+    if args.spawn:
+        # Run a server in this process on a free localhost port, so nothing else has to be started
+        handles = await prime_server.start('127.0.0.1', 0, workers=args.workers, k=args.k, mode=args.mode)
+        host, port = handles[0].sockets[0].getsockname()[:2]
+
+    if args.unix and not args.spawn:
+        def open_connection():
+            return asyncio.open_unix_connection(args.unix)
+    else:
+        def open_connection():
+            return asyncio.open_connection(host, port)
+
+    rng = random.Random(args.seed)
+    workloads = [[rng.getrandbits(args.bits) | 1 for _ in range(args.requests)]
+                 for _ in range(args.connections)]
+    latencies = []
+    verdicts = collections.Counter()
+
+    t1 = time.perf_counter()
+    await asyncio.gather(*(client(open_connection, numbers, args.depth, latencies, verdicts)
+                           for numbers in workloads))
+    elapsed = time.perf_counter() - t1
+
+    if handles is not None:
+        await prime_server.stop(*handles)
+
+    latencies.sort()
+    print('Requests:     {:d} over {:d} connections in {:.3f} sec'.format(len(latencies), args.connections, elapsed))
+    print('Throughput:   {:.0f} requests/sec'.format(len(latencies) / elapsed))
+    print('Latency p50:  {:.3f} ms'.format(percentile(latencies, 0.50) * 1000))
+    print('Latency p99:  {:.3f} ms'.format(percentile(latencies, 0.99) * 1000))
+    print('Latency mean: {:.3f} ms'.format(statistics.mean(latencies) * 1000))
+    print('Verdicts:     {}'.format(', '.join('{} {:d}'.format(v, c) for v, c in sorted(verdicts.items()))))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load the primality server and report latency and throughput',
+                                     epilog=CHECKS, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3120)
+    parser.add_argument('--unix', metavar='PATH', help='connect to a Unix socket instead of TCP')
+    parser.add_argument('--spawn', action='store_true', help='start a server on a free localhost port first')
+    parser.add_argument('--workers', type=int, default=None, help='pool size of a spawned server')
+    parser.add_argument('-k', type=int, default=20, help='rounds used by a spawned server')
+    parser.add_argument('--mode', default='miller_rabin', help='test used by a spawned server')
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000, help='requests per connection')
+    parser.add_argument('--depth', type=int, default=64, help='outstanding requests per connection')
+    parser.add_argument('--bits', type=int, default=256, help='size of the random odd numbers sent')
+    parser.add_argument('--seed', type=int, default=312)
+    asyncio.run(generate(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import numpy as np
+
+# Miller-Rabin witnesses that are exact for every n < 2^64
+BASES = (2, 325, 9375, 28178, 450775, 9780504, 1795265022)
+
+LOW32 = np.uint64(0xFFFFFFFF)
+SHIFT32 = np.uint64(32)
+ONE = np.uint64(1)
+TWO = np.uint64(2)
+
+
+# Full 128-bit product of two uint64 arrays as (high, low) halves, built from 32-bit limbs
+# Every partial product of two 32-bit limbs fits in a uint64 lane
+def mul_wide(a, b):
+    a0, a1 = a & LOW32, a >> SHIFT32
+    b0, b1 = b & LOW32, b >> SHIFT32
+    p00 = a0 * b0
+    p01 = a0 * b1
+    p10 = a1 * b0
+    p11 = a1 * b1
+    # Sum of the middle column, below 3 * 2^32 so it cannot overflow
+    middle = (p00 >> SHIFT32) + (p01 & LOW32) + (p10 & LOW32)
+    high = p11 + (p01 >> SHIFT32) + (p10 >> SHIFT32) + (middle >> SHIFT32)
+    low = a * b  # uint64 multiplication wraps, which is exactly the low half
+    return high, low
+
+
+# Per-lane Montgomery constants for odd moduli n with R = 2^64
+class Montgomery64:
+    def __init__(self, n):
+        self.n = n
+        # Newton's iteration doubles the correct low bits of n^-1 mod 2^64 each step, n * n = 1 mod 8 to start
+        inverse = n.copy()
+        for _ in range(5):
+            inverse *= TWO - n * inverse
+        self.n_prime = np.uint64(0) - inverse  # -n^-1 mod 2^64
+
+        # R mod n, which is also 1 in Montgomery form
+        self.one = (np.uint64(0) - n) % n
+        # R^2 mod n by doubling R mod n another 64 times, converts into Montgomery form with one multiply
+        r2 = self.one.copy()
+        for _ in range(64):
+            r2 = self.add(r2, r2)
+        self.r2 = r2
+        self.minus_one = n - self.one  # n - 1 in Montgomery form
+
+    # (a + b) mod n for a, b < n, where the sum may wrap past 2^64
+    def add(self, a, b):
+        total = a + b
+        wrapped = total < a
+        return np.where(wrapped | (total >= self.n), total - self.n, total)
+
+    # a * b / R mod n for a, b < n
+    def mul(self, a, b):
+        high, low = mul_wide(a, b)
+        m = low * self.n_prime  # Chosen so low + low(m * n) is a multiple of 2^64
+        m_high, _ = mul_wide(m, self.n)
+        # The two low halves sum to 0 or 2^64, so they carry exactly when low is nonzero
+        carry = (low != 0).astype(np.uint64)
+        total = high + m_high
+        wrapped = total < high
+        total += carry
+        wrapped |= (total < carry)
+        return np.where(wrapped | (total >= self.n), total - self.n, total)
+
+    def to_montgomery(self, a):
+        return self.mul(a % self.n, self.r2)
+
+    # base^exp in Montgomery form, lane by lane, with base already in Montgomery form
+    # A fermat.Stats passed as stats counts, lane by lane, the products a scalar square and multiply would do
+    def pow(self, base, exp, stats=None):
+        result = self.one.copy()
+        exp = exp.copy()
+        while True:
+            odd = (exp & ONE) != 0
+            result = np.where(odd, self.mul(result, base), result)
+            exp >>= ONE
+            if stats is not None:
+                stats.multiplications += int(np.count_nonzero(odd))
+            if not exp.any():
+                return result
+            if stats is not None:
+                # Only lanes with exponent bits left need the next power of base
+                stats.squarings += int(np.count_nonzero(exp))
+            base = self.mul(base, base)
+
+
+# Lanes per chunk, small enough that the temporaries of one multiply stay in cache
+CHUNK = 8192
+
+
+# Exact Miller-Rabin over a uint64 array of odd n > 2, using the 7-base set
+# Returns a bool array, True where n is prime
+# A fermat.Stats passed as stats receives the rounds, exponentiations and products of every lane
+def miller_rabin(n, stats=None):
+    prime = np.empty(n.shape, dtype=bool)
+    for start in range(0, n.size, CHUNK):
+        prime[start:start + CHUNK] = miller_rabin_chunk(n[start:start + CHUNK], stats)
+    return prime
+
+
+def miller_rabin_chunk(n, stats=None):
+    # Decompose every n - 1 = 2^s * d at once
+    d = n - ONE
+    s = np.zeros(n.shape, dtype=np.uint64)
+    while True:
+        even = (d & ONE) == 0
+        if not even.any():
+            break
+        d = np.where(even, d >> ONE, d)
+        s += even
+
+    prime = np.ones(n.shape, dtype=bool)
+    alive = np.arange(n.size)  # Lanes no base has proven composite yet
+    for round_number, a in enumerate(BASES, 1):
+        # Most composites fail the first base, so later bases only run on the survivors
+        m, dm, sm = n[alive], d[alive], s[alive]
+        context = Montgomery64(m)
+        base = np.uint64(a) % m
+        skip = base == 0  # A base that is a multiple of n says nothing about it
+        if stats is not None:
+            # One round and one exponentiation per surviving lane, as the scalar test counts them
+            tried = int(np.count_nonzero(~skip))
+            stats.rounds += tried
+            stats.exponentiations += tried
+        x = context.pow(context.to_montgomery(base), dm, stats)
+        passed = skip | (x == context.one) | (x == context.minus_one)
+        # Lanes the scalar loop would still be squaring, it stops at n - 1 and at 1
+        searching = ~passed
+        # Square up to s - 1 more times, only lanes with squarings left can still pass
+        for r in range(1, int(sm.max())):
+            x = context.mul(x, x)
+            if stats is not None:
+                searching &= np.uint64(r) < sm
+                stats.squarings += int(np.count_nonzero(searching))
+            passed |= (x == context.minus_one) & (np.uint64(r) < sm)
+            searching &= ~passed & (x != context.one)
+        if stats is not None and not passed.all():
+            stats.witness_rounds[round_number] += int(np.count_nonzero(~passed))
+        prime[alive[~passed]] = False
+        alive = alive[passed]
+        if alive.size == 0:
+            break
+    return prime
@@ -0,0 +1,214 @@
+import collections
+import hashlib
+import sqlite3
+
+import fermat
+
+# Verdicts kept in memory per cache
+MEMORY_SIZE = 65536
+# Rows kept on disk across both tables before the least recently used ones are evicted
+DISK_SIZE = 1000000
+# Fraction of DISK_SIZE evicted at once, so eviction does not run on every insert
+EVICT_FRACTION = 0.05
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS proven (
+    key BLOB PRIMARY KEY,
+    n TEXT NOT NULL,
+    verdict TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    witness TEXT,
+    used INTEGER NOT NULL,
+    rounds INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS probable (
+    key BLOB NOT NULL,
+    mode TEXT NOT NULL,
+    n TEXT NOT NULL,
+    verdict TEXT NOT NULL,
+    rounds INTEGER NOT NULL,
+    confidence REAL,
+    used INTEGER NOT NULL,
+    PRIMARY KEY (key, mode)
+);
+CREATE INDEX IF NOT EXISTS proven_used ON proven (used);
+CREATE INDEX IF NOT EXISTS probable_used ON probable (used);
+'''
+
+
+# Disk key for n, a hash so every row has the same size no matter how big n is
+def key(n):
+    return hashlib.sha256(str(n).encode()).digest()
+
+
+# Confidence classify would report for a prime verdict, without running any rounds
+def needed_confidence(n, k, mode, deterministic):
+    if mode == 'miller_rabin':
+        return fermat.mcertainty(n, k, deterministic)
+    if mode == 'fermat':
+        return fermat.fprobability(k)
+    return 1.0 if n < fermat.BPSW_VERIFIED_BOUND else None
+
+
+# True when a prime verdict from mode is exact rather than probabilistic
+def exact(n, mode, deterministic):
+    if mode == 'sieve':
+        return True
+    if mode == 'miller_rabin':
+        return fermat.deterministic_bases(n, deterministic) is not None
+    if mode == 'bpsw':
+        return n < fermat.BPSW_VERIFIED_BOUND
+    return False
+
+
+# Cache of primality verdicts in front of fermat.classify, in memory and optionally on disk
+# Proven answers (exact primes and composites with a witness) are kept apart from probabilistic ones
+class PrimeCache:
+    def __init__(self, path=None, memory_size=MEMORY_SIZE, disk_size=DISK_SIZE):
+        self.memory = collections.OrderedDict()
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.clock = 0  # Recency stamp for the disk rows
+        self.inserts = 0  # Rows written since the last eviction, disk hits move clock but never this
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path)
+            self.db.executescript(SCHEMA)
+            # Files written before proven rows kept their rounds get the column, their old rows report 0
+            columns = [row[1] for row in self.db.execute('PRAGMA table_info(proven)')]
+            if 'rounds' not in columns:
+                self.db.execute('ALTER TABLE proven ADD COLUMN rounds INTEGER NOT NULL DEFAULT 0')
+            row = self.db.execute('SELECT MAX(used) FROM (SELECT used FROM proven UNION ALL '
+                                  'SELECT used FROM probable)').fetchone()
+            self.clock = row[0] or 0
+
+    def close(self):
+        if self.db is not None:
+            self.db.commit()
+            self.db.close()
+            self.db = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Same answer as fermat.classify(n, k, mode, deterministic), from the cache when possible
+    # The sieve answers below fermat.SIEVE_BOUND in O(1), so those never touch the cache
+    def classify(self, n, k, mode='miller_rabin', deterministic=None):
+        if n < fermat.SIEVE_BOUND:
+            return fermat.classify(n, k, mode, deterministic)
+        needed = needed_confidence(n, k, mode, deterministic)
+        hit = self.lookup(n, mode, needed)
+        if hit is not None:
+            return hit
+        result, witness = fermat.classify_witness(n, k, mode, deterministic)
+        self.store(n, k, result, deterministic, witness)
+        return result
+
+    # Same answer as fermat.prime_test, skipping both tests when the cache holds a proof
+    # Only the second test goes through the cache, Fermat still runs on a miss
+    def prime_test(self, n, k, deterministic=None, mode='miller_rabin'):
+        if n < fermat.SIEVE_BOUND:
+            return fermat.prime_test(n, k, deterministic, mode)
+        proven = self.lookup_proven(n)
+        if proven is not None:
+            return proven[0], proven[0]
+        verdict, used, rounds, confidence = self.classify(n, k, mode, deterministic)
+        if used == 'sieve':
+            return verdict, verdict
+        return fermat.run_fermat(n, k), verdict
+
+    def lookup(self, n, mode, needed):
+        proven = self.lookup_proven(n)
+        if proven is not None:
+            return proven
+
+        result = self.memory.get((n, mode))
+        if result is None and self.db is not None:
+            row = self.db.execute('SELECT n, verdict, rounds, confidence FROM probable WHERE key = ? AND mode = ?',
+                                  (key(n), mode)).fetchone()
+            if row is not None and row[0] == str(n):
+                result = row[1], mode, row[2], row[3]
+                self.touch('probable', n, mode)
+        if result is None:
+            return None
+
+        # A probabilistic verdict only counts if it reached the confidence this call asks for
+        confidence = result[3]
+        if needed is not None and (confidence is None or confidence < needed):
+            return None
+        self.remember((n, mode), result)
+        return result
+
+    # Look up an exact answer for n, from memory first and then from disk
+    def lookup_proven(self, n):
+        result = self.memory.get(n)
+        if result is None and self.db is not None:
+            row = self.db.execute('SELECT n, verdict, mode, rounds FROM proven WHERE key = ?', (key(n),)).fetchone()
+            if row is not None and row[0] == str(n):
+                result = row[1], row[2], row[3], 1.0
+                self.touch('proven', n)
+        if result is not None:
+            self.remember(n, result)
+        return result
+
+    # Record a fresh result, exact answers and witnessed composites go to the proven table
+    # witness is the base the test found a composite with, one is only searched for when the test had none
+    def store(self, n, k, result, deterministic=None, witness=None):
+        verdict, mode, rounds, confidence = result
+        if verdict == 'composite' and mode != 'sieve' and witness is None:
+            witness = fermat.composite_witness(n, k)
+        if verdict == 'prime':
+            proven = exact(n, mode, deterministic)
+        else:
+            proven = mode == 'sieve' or witness is not None
+
+        self.remember(n if proven else (n, mode), result)
+        if self.db is None:
+            return
+        self.clock += 1
+        if proven:
+            self.db.execute('INSERT OR REPLACE INTO proven (key, n, verdict, mode, witness, used, rounds) '
+                            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            (key(n), str(n), verdict, mode,
+                             None if witness is None else str(witness), self.clock, rounds))
+        else:
+            self.db.execute('INSERT OR REPLACE INTO probable VALUES (?, ?, ?, ?, ?, ?, ?)',
+                            (key(n), mode, str(n), verdict, rounds, confidence, self.clock))
+        self.inserts += 1
+        self.evict()
+
+    # Keep the in-memory LRU at memory_size entries O(1)
+    def remember(self, entry, result):
+        self.memory[entry] = result
+        self.memory.move_to_end(entry)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def touch(self, table, n, mode=None):
+        self.clock += 1
+        if mode is None:
+            self.db.execute('UPDATE proven SET used = ? WHERE key = ?', (self.clock, key(n)))
+        else:
+            self.db.execute('UPDATE probable SET used = ? WHERE key = ? AND mode = ?',
+                            (self.clock, key(n), mode))
+
+    # Drop the least recently used rows of both tables once together they grow past disk_size
+    # Runs once every disk_size * EVICT_FRACTION inserts, so the store overshoots by at most that many rows
+    def evict(self):
+        if self.inserts < max(1, int(self.disk_size * EVICT_FRACTION)):
+            return
+        self.inserts = 0
+        count = sum(self.db.execute('SELECT COUNT(*) FROM {}'.format(table)).fetchone()[0]
+                    for table in ('proven', 'probable'))
+        excess = count - self.disk_size
+        if excess > 0:
+            # Every store and touch takes a new clock value, so the excess oldest rows are those used up to the
+            # excess-th smallest stamp
+            cutoff = self.db.execute('SELECT used FROM (SELECT used FROM proven UNION ALL SELECT used FROM probable) '
+                                     'ORDER BY used LIMIT 1 OFFSET ?', (excess - 1,)).fetchone()[0]
+            for table in ('proven', 'probable'):
+                self.db.execute('DELETE FROM {} WHERE used <= ?'.format(table), (cutoff,))
+        self.db.commit()
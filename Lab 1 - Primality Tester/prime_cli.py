@@ -0,0 +1,87 @@
+#!/usr/bin/python3
+
+import argparse
+import itertools
+import json
+import sys
+
+# Only the tester itself is imported, never PyQt, so the command starts quickly
+import fermat
+
+# Lines read, tested and written together, bounds memory no matter how long the input is
+BATCH_SIZE = 4096
+
+
+# Format one result as a tab separated line: n, verdict, mode, rounds, confidence
+def tsv_row(n, verdict, mode, rounds, confidence):
+    confidence = '' if confidence is None else repr(confidence)
+    return '{}\t{}\t{}\t{}\t{}\n'.format(n, verdict, mode, rounds, confidence)
+
+
+# Format one result as a JSON line, n stays a string so big values survive any JSON parser
+def json_row(n, verdict, mode, rounds, confidence):
+    return json.dumps({'n': n, 'verdict': verdict, 'mode': mode,
+                       'rounds': rounds, 'confidence': confidence}) + '\n'
+
+
+FORMATS = {'tsv': tsv_row, 'json': json_row}
+
+
+# Test one input line, lines that are not integers come back with the verdict 'invalid'
+def test_line(line, k, mode, deterministic, classify=fermat.classify):
+    text = line.strip()
+    try:
+        n = int(text)
+    except ValueError:
+        return text, 'invalid', mode, 0, None
+    return (text,) + classify(n, k, mode, deterministic)
+
+
+# Test every non-blank line of source and write one result line per input, a batch at a time
+def stream(source, out, k, mode, deterministic=None, fmt='tsv', batch_size=BATCH_SIZE,
+           classify=fermat.classify):
+    row = FORMATS[fmt]
+    lines = (line for line in source if line.strip())
+    while True:
+        batch = list(itertools.islice(lines, batch_size))
+        if not batch:
+            break
+        out.write(''.join(row(*test_line(line, k, mode, deterministic, classify)) for line in batch))
+        out.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Test integers for primality, one per line')
+    parser.add_argument('path', nargs='?', default='-', help='input file, stdin when omitted or -')
+    parser.add_argument('-k', type=int, default=20, help='rounds for the Fermat and Miller-Rabin tests')
+    parser.add_argument('--mode', choices=sorted(fermat.TESTS), default='miller_rabin')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='tsv')
+    parser.add_argument('--random-witnesses', action='store_true',
+                        help='never use the fixed Miller-Rabin witness sets')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--cache', metavar='PATH', help='reuse and record verdicts in this cache file')
+    args = parser.parse_args(argv)
+
+    deterministic = False if args.random_witnesses else None
+    classify = fermat.classify
+    cache = None
+    if args.cache:
+        import prime_cache  # Only loaded when asked for, sqlite3 adds to startup time
+        cache = prime_cache.PrimeCache(args.cache)
+        classify = cache.classify
+
+    source = sys.stdin if args.path == '-' else open(args.path)
+    try:
+        stream(source, sys.stdout, args.k, args.mode, deterministic, args.format, args.batch_size, classify)
+    except BrokenPipeError:
+        # The reader went away (for example head), which is not an error in a pipeline
+        sys.stderr.close()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if cache is not None:
+            cache.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,293 @@
+#!/usr/bin/python3
+
+import argparse
+import asyncio
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import fermat
+
+# Requests coalesced into one micro-batch for the process pool
+BATCH_SIZE = 256
+# Total bits of the numbers in one micro-batch, a batch runs on one worker and its cost grows with the size
+# of its numbers, so large numbers are cut into smaller batches that spread over the whole pool
+# 256 numbers of 64 bits fill one batch, 4096 bit numbers go 4 to a batch
+BATCH_BITS = 256 * 64
+# Seconds the first request of a batch waits for others to join it
+BATCH_WINDOW = 0.002
+# Requests waiting for a batch before readers stop accepting more, which pushes back on clients
+QUEUE_SIZE = 8192
+# Answers one connection may have outstanding before its reader stops reading
+PIPELINE_DEPTH = 1024
+# Seconds a request may wait for its answer before it is answered with 'timeout'
+DEADLINE = 5.0
+# Seconds a connection may go without sending a line, or without taking our answers, before it is dropped
+IDLE_TIMEOUT = 60.0
+# Micro-batches in the pool at once per worker
+BATCHES_PER_WORKER = 2
+
+
+# Worker side: classify one micro-batch, answering None for values whose deadline passed before their turn
+# time.monotonic is one clock for every process on a host, so deadlines set by the server hold here
+def classify_batch(values, deadlines, k, mode):
+    results = []
+    for n, deadline in zip(values, deadlines):
+        results.append(None if time.monotonic() > deadline else fermat.classify(n, k, mode))
+    return results
+
+
+# One tab separated answer line: n, verdict, mode, rounds, confidence
+def answer(text, verdict, mode='', rounds='', confidence=None):
+    confidence = '' if confidence is None else repr(confidence)
+    return '{}\t{}\t{}\t{}\t{}\n'.format(text, verdict, mode, rounds, confidence).encode()
+
+
+# Groups requests from every connection into micro-batches and runs them on a process pool
+class Coalescer:
+    def __init__(self, executor, workers, k, mode, batch_size=BATCH_SIZE, window=BATCH_WINDOW,
+                 queue_size=QUEUE_SIZE, batch_bits=BATCH_BITS):
+        self.executor = executor
+        self.k = k
+        self.mode = mode
+        self.batch_size = batch_size
+        self.batch_bits = batch_bits
+        self.window = window
+        self.queue = asyncio.Queue(queue_size)
+        self.slots = asyncio.Semaphore(workers * BATCHES_PER_WORKER)
+        self.task = None
+        self.dispatches = set()  # The event loop only keeps weak references to running tasks
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    # Queue n and return a future for its classify result, waits while the queue is full
+    async def submit(self, n, deadline):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((n, deadline, future))
+        return future
+
+    # Cut micro-batches off the queue, never holding the first request longer than the window
+    # A batch closes at batch_size requests or once its numbers add up to batch_bits bits, whichever comes first
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            bits = batch[0][0].bit_length()
+            flush_at = loop.time() + self.window
+            while len(batch) < self.batch_size and bits < self.batch_bits:
+                remaining = flush_at - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+                bits += batch[-1][0].bit_length()
+
+            # Requests already past their deadline or given up on are not worth a worker's time
+            now = time.monotonic()
+            live = []
+            for n, deadline, future in batch:
+                if future.done():
+                    continue
+                if now > deadline:
+                    future.set_result(None)
+                else:
+                    live.append((n, deadline, future))
+            if live:
+                await self.slots.acquire()
+                task = asyncio.create_task(self.dispatch(live))
+                self.dispatches.add(task)
+                task.add_done_callback(self.dispatches.discard)
+
+    async def dispatch(self, live):
+        loop = asyncio.get_running_loop()
+        try:
+            # Callers may have given up while the batch waited for a slot, the worker skips expired values itself
+            live = [(n, deadline, future) for n, deadline, future in live if not future.done()]
+            if not live:
+                return
+            results = await loop.run_in_executor(self.executor, classify_batch, [n for n, _, _ in live],
+                                                 [deadline for _, deadline, _ in live], self.k, self.mode)
+            for (_, _, future), result in zip(live, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            for _, _, future in live:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self.slots.release()
+
+
+# Serves one client: answers come back in request order, one line per input line
+class Connection:
+    def __init__(self, coalescer, reader, writer, deadline=DEADLINE, idle_timeout=IDLE_TIMEOUT):
+        self.coalescer = coalescer
+        self.reader = reader
+        self.writer = writer
+        self.deadline = deadline
+        self.idle_timeout = idle_timeout
+        self.pending = asyncio.Queue(PIPELINE_DEPTH)
+
+    # Read and respond side by side until either side is done with the client
+    # Once reading ends the requests already read are still answered, once writing fails reading is cancelled,
+    # since nothing would take its answers and it would park on a full pipeline
+    async def serve(self):
+        reading = asyncio.create_task(self.read())
+        responder = asyncio.create_task(self.respond())
+        end = None
+        try:
+            await asyncio.wait((reading, responder), return_when=asyncio.FIRST_COMPLETED)
+            if not responder.done():
+                # The responder returns on the end marker or on a failed write, so this wait always ends,
+                # and the marker is cancelled below if the responder gave up before taking it
+                end = asyncio.create_task(self.pending.put(None))
+                await asyncio.wait((responder,))
+        finally:
+            for task in (reading, responder, end):
+                if task is not None:
+                    task.cancel()
+            await asyncio.gather(reading, responder, *([end] if end else []), return_exceptions=True)
+            self.abandon()
+            self.writer.close()
+
+    # Cancel the requests nobody will read the answers of, so the coalescer skips any still queued
+    def abandon(self):
+        while not self.pending.empty():
+            item = self.pending.get_nowait()
+            if item is not None and item[1] is not None:
+                item[1].cancel()
+
+    # Returns at end of input, when the client resets, or after idle_timeout seconds without a line
+    async def read(self):
+        while True:
+            try:
+                line = await asyncio.wait_for(self.reader.readline(), self.idle_timeout)
+            except (ConnectionError, asyncio.TimeoutError):
+                return
+            if not line:
+                return
+            text = line.strip().decode(errors='replace')
+            if not text:
+                continue
+            expires = time.monotonic() + self.deadline
+            try:
+                n = int(text)
+            except ValueError:
+                await self.pending.put((text, None, expires))
+                continue
+            future = await self.coalescer.submit(n, expires)
+            await self.pending.put((text, future, expires))
+
+    # Answer line for one request, waiting no later than its deadline
+    async def result(self, text, future, expires):
+        if future is None:
+            return answer(text, 'invalid')
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), max(0.0, expires - time.monotonic()))
+        except asyncio.TimeoutError:
+            future.cancel()  # Lets the coalescer skip it if it is still queued
+            return answer(text, 'timeout')
+        except Exception:
+            return answer(text, 'error')
+        # The coalescer answers None for requests that expired before reaching a batch
+        if result is None:
+            return answer(text, 'timeout')
+        return answer(text, *result)
+
+    async def respond(self):
+        while True:
+            item = await self.pending.get()
+            if item is None:
+                return
+            text, future, expires = item
+            line = await self.result(text, future, expires)
+            # A client that reset is gone, writing the rest of its pipeline to it would only fail
+            if self.writer.is_closing():
+                return
+            self.writer.write(line)
+            # Waiting for the socket to drain keeps a slow reader from growing our buffers,
+            # a client that takes nothing for idle_timeout seconds is given up on
+            if self.pending.empty():
+                try:
+                    await asyncio.wait_for(self.writer.drain(), self.idle_timeout)
+                except (ConnectionError, asyncio.TimeoutError):
+                    return
+
+
+# Start the server, on a Unix socket when path is given and on TCP host:port otherwise
+# Returns (server, coalescer, executor), close all three with stop()
+async def start(host='127.0.0.1', port=0, path=None, workers=None, k=20, mode='miller_rabin',
+                deadline=DEADLINE, batch_size=BATCH_SIZE, window=BATCH_WINDOW, idle_timeout=IDLE_TIMEOUT,
+                batch_bits=BATCH_BITS):
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers)
+    coalescer = Coalescer(executor, workers, k, mode, batch_size, window, batch_bits=batch_bits)
+    coalescer.start()
+
+    async def handle(reader, writer):
+        try:
+            await Connection(coalescer, reader, writer, deadline, idle_timeout).serve()
+        except asyncio.CancelledError:
+            # Shutting down with the client still connected, just drop the connection
+            writer.close()
+
+    if path is not None:
+        server = await asyncio.start_unix_server(handle, path=path)
+    else:
+        server = await asyncio.start_server(handle, host, port)
+    return server, coalescer, executor
+
+
+async def stop(server, coalescer, executor):
+    server.close()
+    await server.wait_closed()
+    await coalescer.stop()
+    executor.shutdown(cancel_futures=True)
+
+
+async def serve(args):
+    handles = await start(args.host, args.port, args.unix, args.workers, args.k, args.mode,
+                          args.deadline, args.batch_size, args.window, args.idle_timeout, args.batch_bits)
+    server = handles[0]
+    for sock in server.sockets:
+        print('Listening on {}'.format(sock.getsockname()), flush=True)
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+    await stopped.wait()
+    await stop(*handles)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve primality verdicts for newline separated integers')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3120)
+    parser.add_argument('--unix', metavar='PATH', help='listen on a Unix socket instead of TCP')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('-k', type=int, default=20, help='rounds for the Fermat and Miller-Rabin tests')
+    parser.add_argument('--mode', choices=sorted(fermat.TESTS), default='miller_rabin')
+    parser.add_argument('--deadline', type=float, default=DEADLINE, help='seconds before a request times out')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--batch-bits', type=int, default=BATCH_BITS, help='total bits of the numbers in one batch')
+    parser.add_argument('--window', type=float, default=BATCH_WINDOW, help='seconds a batch waits to fill')
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT,
+                        help='seconds before a connection that sends or takes nothing is dropped')
+    asyncio.run(serve(parser.parse_args(argv)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import collections
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import fermat
+
+# Numbers handed to a worker at a time
+CHUNK_SIZE = 4096
+# Chunks kept in flight per worker, bounds memory while the pool stays busy
+CHUNKS_PER_WORKER = 2
+
+
+# Worker side: test every value in one chunk O(c * k * n^3)
+def test_chunk(values, k, mode):
+    test = fermat.TESTS[mode]
+    return [test(n, k) for n in values]
+
+
+# Worker side: find the primes in [lo, hi) O(c * k * n^3)
+def scan_chunk(lo, hi, k, mode):
+    test = fermat.TESTS[mode]
+    primes = [2] if lo <= 2 < hi else []
+    # Only odd candidates can be prime past 2
+    primes.extend(n for n in range(max(lo, 3) | 1, hi, 2) if test(n, k) == 'prime')
+    return primes
+
+
+# Submit every task but keep at most window chunks in flight, yielding results in submission order
+def ordered_results(executor, fn, tasks, window):
+    pending = collections.deque()
+    for args in tasks:
+        pending.append(executor.submit(fn, *args))
+        if len(pending) >= window:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def pool_size(workers):
+    return workers or os.cpu_count() or 1
+
+
+# Stream one verdict per input value, in input order, testing chunks across worker processes
+def scan_batch(values, k, mode='miller_rabin', chunk_size=CHUNK_SIZE, workers=None):
+    workers = pool_size(workers)
+    values = iter(values)
+    # Chunks are cut lazily so values can be an unbounded stream
+    chunks = iter(lambda: list(itertools.islice(values, chunk_size)), [])
+    tasks = ((chunk, k, mode) for chunk in chunks)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from ordered_results(executor, test_chunk, tasks, workers * CHUNKS_PER_WORKER)
+
+
+# Stream the primes in [a, b] in increasing order, scanning chunks across worker processes
+def scan_range(a, b, k, mode='miller_rabin', chunk_size=CHUNK_SIZE, workers=None):
+    workers = pool_size(workers)
+    tasks = ((lo, min(lo + chunk_size, b + 1), k, mode) for lo in range(a, b + 1, chunk_size))
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from ordered_results(executor, scan_chunk, tasks, workers * CHUNKS_PER_WORKER)
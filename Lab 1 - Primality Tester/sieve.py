@@ -0,0 +1,110 @@
+import math
+
+# Odd numbers covered by one segment, one byte each while sieving (32 KiB fits in L1 cache)
+SEGMENT_SIZE = 1 << 15
+# Smallest lookup table is_prime builds, later tables double until they cover n
+TABLE_MIN = 1 << 16
+# Largest table is_prime builds, 1 MiB of bits, larger numbers belong to the tests in fermat
+# Building the table for n costs O(n) time and a byte per odd number while sieving
+TABLE_MAX = 1 << 24
+
+
+# List every prime below limit with a simple sieve, used for the base primes of each segment
+# Time complexity is O(n log log n) and space complexity is O(n)
+def primes_below(limit):
+    if limit <= 2:
+        return []
+    sieve = bytearray([1]) * limit
+    sieve[0:2] = b'\x00\x00'
+    for p in range(2, math.isqrt(limit - 1) + 1):
+        if sieve[p]:
+            sieve[p * p::p] = bytes(len(range(p * p, limit, p)))
+    return [p for p in range(limit) if sieve[p]]
+
+
+# Sieve the odd numbers in [a, b] one cache-sized segment at a time
+# Yields (lo, flags) where flags[i] is 1 exactly when lo + 2i is prime
+# Time complexity is O(n log log n) and space complexity is O(sqrt(b) + SEGMENT_SIZE)
+def segments(a, b, segment_size=SEGMENT_SIZE):
+    lo = max(a, 3) | 1  # First odd number in range, 1 is not prime
+    if lo > b:
+        return
+    odd_primes = primes_below(math.isqrt(b) + 1)[1:]
+
+    while lo <= b:
+        hi = min(lo + 2 * segment_size - 2, b)  # Last number covered by this segment
+        length = (hi - lo) // 2 + 1
+        flags = bytearray([1]) * length
+
+        for p in odd_primes:
+            start = p * p
+            if start > hi:
+                break
+            if start < lo:
+                # First odd multiple of p at or above lo
+                start = lo + (-lo) % p
+                if start % 2 == 0:
+                    start += p
+            index = (start - lo) // 2
+            flags[index::p] = bytes(len(range(index, length, p)))
+
+        yield lo, flags
+        lo = hi + 2 if hi % 2 else hi + 1
+
+
+# Every prime p with a <= p <= b
+def primes_in_range(a, b):
+    primes = [2] if a <= 2 <= b else []
+    for lo, flags in segments(a, b):
+        primes.extend(lo + 2 * i for i, flag in enumerate(flags) if flag)
+    return primes
+
+
+# Number of primes p with a <= p <= b, counted without building the list
+def count_primes(a, b):
+    count = 1 if a <= 2 <= b else 0
+    for lo, flags in segments(a, b):
+        count += flags.count(1)
+    return count
+
+
+# Map 0/1 flag bytes to the ASCII digits int() reads
+BIT_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+
+
+# Bit-packed table of the odd primes below limit, bit i of the table stands for 2i + 1
+# Space complexity is O(n / 16) bytes
+class PrimeTable:
+    def __init__(self, limit):
+        self.limit = limit
+        flags = bytearray(1)  # Flag for 1, the segments start at 3
+        for lo, segment in segments(0, limit - 1):
+            flags += segment
+        # Reversing the 0/1 bytes lets one int() call pack every flag into a bit
+        bits = int(flags.translate(BIT_DIGITS)[::-1], 2)
+        self.bits = bits.to_bytes((limit + 15) // 16, 'little')
+
+    # Look n up in the table O(1)
+    def __contains__(self, n):
+        if n >= self.limit:
+            raise ValueError('{:d} is past the end of the table'.format(n))
+        if n < 2 or n % 2 == 0:
+            return n == 2
+        i = n >> 1
+        return bool(self.bits[i >> 3] >> (i & 7) & 1)
+
+
+_table = None
+
+
+# Answer primality exactly from a cached table, growing it by doubling to cover n up to TABLE_MAX
+def is_prime(n):
+    global _table
+    if n >= TABLE_MAX:
+        raise ValueError('{:d} is past the largest table, {:d}'.format(n, TABLE_MAX))
+    if _table is None or n >= _table.limit:
+        limit = _table.limit if _table is not None else TABLE_MIN
+        while limit <= n:
+            limit *= 2
+        _table = PrimeTable(min(limit, TABLE_MAX))
+    return n in _table
@@ -0,0 +1,41 @@
+import unittest
+
+import fermat
+
+
+class VerifyCertificateTest(unittest.TestCase):
+    def test_accepts_generated_certificates(self):
+        for n in (1000003, 2 ** 61 - 1, fermat.next_prime(10 ** 30)):
+            certificate = fermat.prime_certificate(n)
+            self.assertIsNotNone(certificate)
+            self.assertTrue(fermat.verify_certificate(certificate))
+
+    # The Carmichael number 8167 * 16333 * 24499 with the prime 1361 | n - 1 listed twice
+    def test_rejects_repeated_factor(self):
+        n = 3267961077889
+        q = 1361
+        a = fermat.pocklington_base(n, q)
+        self.assertIsNotNone(a)
+        forged = (n, ((q, 1, a, (q, ())), (q, 1, a, (q, ()))))
+        self.assertFalse(fermat.verify_certificate(forged))
+
+    def test_rejects_increasing_factors(self):
+        n = fermat.next_prime(10 ** 30)
+        certificate = fermat.prime_certificate(n)
+        self.assertGreater(len(certificate[1]), 1)
+        self.assertFalse(fermat.verify_certificate((n, tuple(reversed(certificate[1])))))
+
+    # A huge exponent has to be turned down before q^e is computed, this one would never finish
+    def test_rejects_huge_exponent(self):
+        q = 2 ** 31 - 1
+        forged = (2 ** 61 - 1, ((q, 10 ** 9, 3, (q, ())),))
+        self.assertFalse(fermat.verify_certificate(forged))
+
+    def test_rejects_malformed(self):
+        n = 2 ** 61 - 1
+        for forged in ('x', (n, [(2,)]), (n, None), ('n', ()), (n, [(2, 'e', 3, (2, ()))])):
+            self.assertFalse(fermat.verify_certificate(forged))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,58 +1,200 @@
-from PyQt5.QtCore import QLineF, QPointF, QThread, pyqtSignal
-
+import bisect
 import time
 
-# Find the convex hull of all sorted points O(n log n)
-def convex(points):
-    # Check how many points we have
+# PyQt5 is only needed by the GUI solver thread, the hull functions work on plain coordinates without it
+try:
+    from PyQt5.QtCore import QLineF, QPointF, QThread, pyqtSignal
+except ImportError:
+    QThread = None
+
+# NumPy is optional, hull_indices accepts any sequence of (x, y) pairs without it
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Directions the Akl-Toussaint filter takes extreme points in, counter-clockwise so the extremes form a convex polygon
+FILTER_DIRECTIONS = {
+    4: ((1, 0), (0, 1), (-1, 0), (0, -1)),
+    8: ((1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)),
+}
+
+
+# Every hull function works on point indices into the coordinate lists xs and ys
+# Hulls come back as lists of indices in clockwise order, the x values must be distinct
+
+
+# Split an (N, 2) array or a sequence of (x, y) pairs into lists of floats O(n)
+def coordinates(points):
+    if np is not None:
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return points[:, 0].tolist(), points[:, 1].tolist()
+    return [float(p[0]) for p in points], [float(p[1]) for p in points]
+
+
+# Indices of the points ordered by increasing x-value, ties keep their input order O(n log n)
+# Sorts only the given candidate indices when there are some, all points otherwise
+def sort_by_x(xs, candidates=None):
+    return sorted(range(len(xs)) if candidates is None else candidates, key=xs.__getitem__)
+
+
+# Akl-Toussaint filter: indices of the points not strictly inside the polygon of the extreme points O(n)
+# Nothing strictly inside that polygon can be a hull vertex, on uniform and gaussian clouds that is most points
+def interior_filter(xs, ys, directions=8):
+    if np is None:
+        raise ImportError('The Akl-Toussaint filter needs NumPy')
+    xs = np.asarray(xs, dtype=float)
+    ys = np.asarray(ys, dtype=float)
+    # Fewer than 3 points cannot have an interior, and argmax has nothing to pick from an empty array
+    if len(xs) < 3:
+        return np.arange(len(xs))
+
+    # Extreme point in each direction, neighbouring directions often share one
+    extremes = []
+    for dx, dy in FILTER_DIRECTIONS[directions]:
+        i = int(np.argmax(dx * xs + dy * ys))
+        if not extremes or extremes[-1] != i:
+            extremes.append(i)
+    if len(extremes) > 1 and extremes[0] == extremes[-1]:
+        extremes.pop()
+    if len(extremes) < 3:
+        return np.arange(len(xs))
+
+    # Strictly left of every counter-clockwise edge means strictly inside, points on an edge are kept
+    inside = np.ones(len(xs), dtype=bool)
+    for a, b in zip(extremes, extremes[1:] + extremes[:1]):
+        inside &= (xs[b] - xs[a]) * (ys - ys[a]) - (ys[b] - ys[a]) * (xs - xs[a]) > 0
+    return np.flatnonzero(~inside)
+
+
+# Engine hull_indices and the solver thread use when the caller does not pick one
+HULL_ENGINE = 'merge'
+# Chan's algorithm starts with groups of 2^8 points, every failed guess costs a full pass over the candidates
+# and the smaller guesses fail on nearly every cloud the GUI draws
+CHAN_FIRST_GUESS = 8
+
+
+# Indices of the convex hull vertices of an (N, 2) array of points in clockwise order O(n log n)
+# Returns a NumPy int array, or a list when NumPy is not installed
+# prefilter runs the Akl-Toussaint filter with 4 or 8 directions first, which needs NumPy
+# engine picks an entry of HULL_ENGINES, every engine finds the same polygon but may start it at a different vertex
+# A dict passed as stats receives the number of points, the number kept by the filter and the discarded fraction
+def hull_indices(points, prefilter=None, stats=None, engine=None):
+    kept = None
+    if np is None:
+        if prefilter:
+            raise ImportError('The Akl-Toussaint filter needs NumPy')
+        xs, ys = coordinates(points)
+        n = len(xs)
+    else:
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        n = len(points)
+        if prefilter:
+            kept = interior_filter(points[:, 0], points[:, 1], prefilter)
+            # Only the points that survive the filter are turned into Python floats
+            points = points[kept]
+        xs, ys = points[:, 0].tolist(), points[:, 1].tolist()
+
+    if stats is not None:
+        stats['points'] = n
+        stats['kept'] = len(xs)
+        stats['discarded'] = 1 - len(xs) / n if n else 0.0
+
+    engine = engine or HULL_ENGINE
+    if np is not None and engine == 'merge':
+        # A stable argsort gives the same order as sort_by_x without a Python key call per point
+        hull = convex(xs, ys, np.argsort(points[:, 0], kind='stable').tolist())
+    else:
+        hull = HULL_ENGINES[engine](xs, ys, range(len(xs)))
+    if np is None:
+        return hull
+    hull = np.array(hull, dtype=np.intp)
+    return hull if kept is None else kept[hull]
+
+
+# Rotate a clockwise hull of an (N, 2) array to start at its leftmost vertex O(h)
+# Engines and modes find the same polygon from different starting vertices, this is the order they all agree on
+def canonical(points, hull):
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    hull = np.asarray(hull, dtype=np.intp)
+    if len(hull) == 0:
+        return hull
+    return np.roll(hull, -int(np.argmin(points[hull, 0])))
+
+
+# Divide and conquer engine: sort the candidates by x and merge hulls of halves O(n log n)
+def merge_hull(xs, ys, candidates):
+    return convex(xs, ys, sort_by_x(xs, candidates))
+
+
+# Find the convex hull of the sorted points order[lo:hi] O(n log n)
+# Splits the range in half exactly like the recursive version did, but walks the splits with an explicit
+# stack of index ranges, so no slice of order is ever copied and the depth never hits the recursion limit
+def convex(xs, ys, order, lo=0, hi=None):
+    if hi is None:
+        hi = len(order)
+    if hi <= lo:
+        return []
+
+    # Hulls of finished ranges still waiting for their sibling, at most one per level
+    hulls = []
+    # Each entry is (lo, hi, merging), merging is set once both halves of the range are on hulls
+    stack = [(lo, hi, False)]
+    while stack:
+        lo, hi, merging = stack.pop()
+        if merging:
+            # Merge both sides and keep the final convex hull of the range O(n)
+            right = hulls.pop()
+            left = hulls.pop()
+            hulls.append(merge(xs, ys, left, right))
+        elif hi - lo <= 3:
+            hulls.append(small_hull(xs, ys, order[lo:hi]))
+        else:
+            # Find center in the range of points O(1)
+            center = lo + (hi - lo) // 2
+            # Left is popped first, so its hull lands on hulls before the right one
+            stack.append((lo, hi, True))
+            stack.append((center, hi, False))
+            stack.append((lo, center, False))
+    return hulls[0]
+
+
+# Find the convex hull of 3 or fewer sorted points by brute force O(1)
+def small_hull(xs, ys, points):
     # If we have 2 or less, just return the points O(1)
     if len(points) <= 2:
         return points
 
-    # If we have exactly 3, compute the convex hull by brute force O(1)
-    elif len(points) == 3:
-        # Find the slope O(1)
-        slope1 = slope(points[0], points[1])
-        slope2 = slope(points[0], points[2])
+    # Find the slope O(1)
+    slope1 = slope(xs, ys, points[0], points[1])
+    slope2 = slope(xs, ys, points[0], points[2])
 
-        # Check to see if slopes are clockwise or counter-clockwise
-        if slope1 < slope2:
-            # Swap the points with python's nifty shorthand (no need for a temp variable)
-            points[1], points[2] = points[2], points[1]
-
-        # If points have equal heights (y values), we need to do further checking
-        elif points[1].y() == points[2].y():
-            # Keep points in clockwise order
-            if points[1].y() < points[0].y():
-                # Swap the points
-                points[1], points[2] = points[2], points[1]
+    # Check to see if slopes are clockwise or counter-clockwise
+    if slope1 < slope2:
+        # Swap the points with python's nifty shorthand (no need for a temp variable)
+        points[1], points[2] = points[2], points[1]
 
-        # Finally return the updated array of points
-        return points
+    # If points have equal heights (y values), we need to do further checking
+    elif ys[points[1]] == ys[points[2]]:
+        # Keep points in clockwise order
+        if ys[points[1]] < ys[points[0]]:
+            # Swap the points
+            points[1], points[2] = points[2], points[1]
 
-    # Else we have more than 3 points
-    # Divide and conquer by splitting the points into two sides O(n log n)
-    else:
-        # Find center in the array of points O(1)
-        center = (len(points) // 2)
-        # Split the points into two sides left and right
-        # Call convex recursively O(n log n)
-        left = convex(points[:center])
-        right = convex(points[center:])
-        # Merge both sides and return the final convex hull O(n)
-        return merge(left, right)
+    # Finally return the updated array of points
+    return points
 
 
 # Merge the two sides of the hull into a single polygon O(n)
-def merge(left, right):
+def merge(xs, ys, left, right):
     # Start with the rightmost point of the left hull and the leftmost point of the right hull
-    left_index = rightmost(left)  # O(n)
-    right_index = leftmost(right)  # O(n)
+    left_index = rightmost(xs, left)  # O(n)
+    right_index = leftmost(xs, right)  # O(n)
 
     # Get upper tangent lines O(n)
-    left_upper, right_upper = tangent(left, right, left_index, right_index)
+    left_upper, right_upper = tangent(xs, ys, left, right, left_index, right_index)
     # Get lower tangent lines O(n)
-    right_lower, left_lower = tangent(right, left, right_index, left_index)
+    right_lower, left_lower = tangent(xs, ys, right, left, right_index, left_index)
 
     # Create final array to be populated with convex points
     hull = []
@@ -83,27 +225,27 @@ def merge(left, right):
 
 
 # Find the leftmost side of right convex hull O(n)
-def leftmost(right):
+def leftmost(xs, right):
     # Find the min/lowest value of x in the left convex hull and return its index in the array
-    return right.index(min(right, key=lambda p: p.x()))
+    return min(range(len(right)), key=lambda i: xs[right[i]])
 
 
 # Find the rightmost side of left convex hull O(n)
-def rightmost(left):
+def rightmost(xs, left):
     # Find the max/highest value of x in the left convex hull and return its index in the array
-    return left.index(max(left, key=lambda p: p.x()))
+    return max(range(len(left)), key=lambda i: xs[left[i]])
 
 
 # Find the slope O(1)
-def slope(p1, p2):
+def slope(xs, ys, p1, p2):
     # Slope is equal to y2 - y1 divided by x2 - x1
-    return (p2.y() - p1.y()) / (p2.x() - p1.x())
+    return (ys[p2] - ys[p1]) / (xs[p2] - xs[p1])
 
 
 # Find upper and lower tangent lines O(n)
-def tangent(left, right, left_index, right_index):
+def tangent(xs, ys, left, right, left_index, right_index):
     # Find the slope between the current points O(1)
-    current_slope = slope(left[left_index], right[right_index])
+    current_slope = slope(xs, ys, left[left_index], right[right_index])
     # Set boolean for initial while loop
     initialize = True
 
@@ -118,7 +260,7 @@ def tangent(left, right, left_index, right_index):
             new_right_index = (right_index + 1) % len(right)
 
             # Find the slope between the next points O(1)
-            next_slope = slope(left[left_index], right[new_right_index])
+            next_slope = slope(xs, ys, left[left_index], right[new_right_index])
 
             # If our next slope is smaller than our current one, break out of the loop
             if current_slope > next_slope:
@@ -136,7 +278,7 @@ def tangent(left, right, left_index, right_index):
             new_left_index = (left_index - 1) % len(left)
 
             # Find the slope between the next points O(1)
-            next_slope = slope(left[new_left_index], right[right_index])
+            next_slope = slope(xs, ys, left[new_left_index], right[right_index])
 
             # If our next slope is greater than our current one, break out of the loop
             if current_slope < next_slope:
@@ -150,60 +292,181 @@ def tangent(left, right, left_index, right_index):
     # Return our final found indexes for the tangent line
     return left_index, right_index
 
-# Solve complex hull with the GUI provided O(n log n)
-class ConvexHullSolverThread(QThread):
-    def __init__(self, unsorted_points, demo):
-        self.points = unsorted_points
-        self.pause = demo
-        QThread.__init__(self)
-
-    def __del__(self):
-        self.wait()
-
-    # These two signals are used for interacting with the GUI.
-    show_hull = pyqtSignal(list, tuple)
-    display_text = pyqtSignal(str)
-
-    # Some additional thread signals you can implement and use for debugging, if you like
-    show_tangent = pyqtSignal(list, tuple)
-    erase_hull = pyqtSignal(list)
-    erase_tangent = pyqtSignal(list)
+# Output-sensitive engine (Chan's algorithm) O(n log h) for a hull of h vertices
+# Guesses a hull size m, builds the hulls of groups of m candidates and gift wraps around those group hulls,
+# squaring the guess whenever the wrap needs more than m steps
+def chan(xs, ys, candidates, first_guess=CHAN_FIRST_GUESS):
+    candidates = list(candidates)
+    n = len(candidates)
+    if n <= 3:
+        return small_hull(xs, ys, sort_by_x(xs, candidates))
+    left = min(candidates, key=xs.__getitem__)
+    right = max(candidates, key=xs.__getitem__)
+
+    guess = first_guess
+    while True:
+        m = min(n, 1 << guess)
+        groups = [group_chains(xs, ys, candidates[i:i + m]) for i in range(0, n, m)]
+        # Clockwise is the upper hull left to right, then the lower hull right to left
+        upper = wrap(xs, ys, [group[0] for group in groups], left, right, m)
+        if upper is not None:
+            lower = wrap(xs, ys, [group[1] for group in groups], right, left, m)
+            if lower is not None:
+                return upper[:-1] + lower[:-1]
+        # A point inside the hull of its group is inside the whole hull, so the next guess only regroups group hull vertices
+        candidates = [i for (upper, _), (lower, _) in groups for i in upper + lower[1:-1]]
+        n = len(candidates)
+        guess *= 2
+
+
+# Upper and lower chains of the hull of one group with Andrew's monotone chain O(m log m)
+# Each chain comes with the keys it is ordered by for bisect, x for the upper chain left to right
+# and -x for the lower chain right to left, so wrap treats both the same way
+def group_chains(xs, ys, group):
+    upper = []
+    lower = []
+    for i in sort_by_x(xs, group):
+        x, y = xs[i], ys[i]
+        # Cross products are written out in these loops, they run once per candidate
+        while len(upper) >= 2 and ((xs[upper[-1]] - xs[upper[-2]]) * (y - ys[upper[-2]]) -
+                                   (ys[upper[-1]] - ys[upper[-2]]) * (x - xs[upper[-2]])) >= 0:
+            upper.pop()
+        upper.append(i)
+        while len(lower) >= 2 and ((xs[lower[-1]] - xs[lower[-2]]) * (y - ys[lower[-2]]) -
+                                   (ys[lower[-1]] - ys[lower[-2]]) * (x - xs[lower[-2]])) <= 0:
+            lower.pop()
+        lower.append(i)
+    lower.reverse()
+    return (upper, [xs[i] for i in upper]), (lower, [-xs[i] for i in lower])
+
+
+# Gift wrap from start to stop along one side of the hull, turning clockwise around the group chains
+# Returns the path including both ends, or None once it runs past limit steps
+def wrap(xs, ys, chains, start, stop, limit):
+    path = [start]
+    p = start
+    # The lower side is the upper side turned half a circle, which flips the keys but not the cross products
+    forward = xs[stop] > xs[start]
+    while p != stop:
+        if len(path) > limit:
+            return None
+        px, py = xs[p], ys[p]
+        key = px if forward else -px
+        best = None
+        for chain, keys in chains:
+            # Only chain points past p can come next, and the turn towards them is unimodal along the chain
+            lo = bisect.bisect_right(keys, key)
+            hi = len(chain) - 1
+            if lo > hi:
+                continue
+            # Binary search for the tangent from p, step on while the next point turns further counter-clockwise
+            while lo < hi:
+                mid = (lo + hi) // 2
+                a, b = chain[mid], chain[mid + 1]
+                if (xs[a] - px) * (ys[b] - py) - (ys[a] - py) * (xs[b] - px) > 0:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            q = chain[lo]
+            # Keep the tangent that turns furthest counter-clockwise over every group
+            if best is None or (xs[best] - px) * (ys[q] - py) - (ys[best] - py) * (xs[q] - px) > 0:
+                best = q
+        path.append(best)
+        p = best
+    return path
+
+
+# Hull engines selectable by name, each called as engine(xs, ys, candidates) with the candidates in any order
+HULL_ENGINES = {
+    'merge': merge_hull,
+    'chan': chan,
+}
 
 
-    def set_points(self, unsorted_points, demo):
-        self.points = unsorted_points
-        self.demo = demo
-
-
-    def run(self):
-        assert(type(self.points) == list and type(self.points[0]) == QPointF)
-
-        n = len(self.points)
-        print('Computing Hull for set of {} points'.format(n))
-
-        t1 = time.time()
-        # Sort the points by increasing x-value O(n log n)
-        sorted_points = sorted(self.points, key=lambda p: p.x())
-        t2 = time.time()
-        print('Time Elapsed (Sorting): {:3.3f} sec'.format(t2-t1))
-        t3 = time.time()
-
-        # Compute the convex hull using divide and conquer O(n log n)
-        hull = convex(sorted_points)
-        length = len(hull)
-        t4 = time.time()
-
-        # Pass the convex hull lines back to the GUI for display
-        # This is the convex polygon of all the sorted points O(n)
-        polygon = [QLineF(hull[i], hull[(i + 1) % length]) for i in range(length)]
-
-        # When passing lines to the display, pass a list of QLineF objects.
-        # Each QLineF object can be created with two QPointF objects corresponding to the endpoints
-        assert (type(polygon) == list and type(polygon[0]) == QLineF)
-
-        # Send a signal to the GUI thread with the hull and its color
-        self.show_hull.emit(polygon, (0, 255, 0))
-
-        # Send a signal to the GUI thread with the time used to compute the hull
-        self.display_text.emit('Time Elapsed (Convex Hull): {:3.3f} sec'.format(t4-t3))
-        print('Time Elapsed (Convex Hull): {:3.3f} sec'.format(t4-t3))
+# Solve complex hull with the GUI provided O(n log n)
+# A thin adapter that hands the QPointF coordinates to the hull functions above
+if QThread is not None:
+    class ConvexHullSolverThread(QThread):
+        # prefilter runs the Akl-Toussaint filter with 4 or 8 directions before sorting
+        # engine picks an entry of HULL_ENGINES, the default is the divide and conquer merge
+        # workers above 1 splits the points into x slabs whose hulls are found in that many processes
+        def __init__(self, unsorted_points, demo, prefilter=None, engine=None, workers=None):
+            self.points = unsorted_points
+            self.pause = demo
+            self.prefilter = prefilter
+            self.engine = engine or HULL_ENGINE
+            self.workers = workers
+            QThread.__init__(self)
+
+        def __del__(self):
+            self.wait()
+
+        # These two signals are used for interacting with the GUI.
+        show_hull = pyqtSignal(list, tuple)
+        display_text = pyqtSignal(str)
+
+        # Some additional thread signals you can implement and use for debugging, if you like
+        show_tangent = pyqtSignal(list, tuple)
+        erase_hull = pyqtSignal(list)
+        erase_tangent = pyqtSignal(list)
+
+
+        def set_points(self, unsorted_points, demo):
+            self.points = unsorted_points
+            self.demo = demo
+
+
+        def run(self):
+            assert(type(self.points) == list and type(self.points[0]) == QPointF)
+
+            n = len(self.points)
+            print('Computing Hull for set of {} points'.format(n))
+
+            # Pull the coordinates out once so the hull never calls back into Qt O(n)
+            xs = [p.x() for p in self.points]
+            ys = [p.y() for p in self.points]
+
+            t1 = time.time()
+            # Throw away the points that cannot be on the hull before paying for the sort O(n)
+            candidates = range(n)
+            if self.prefilter:
+                candidates = interior_filter(xs, ys, self.prefilter).tolist()
+                print('Akl-Toussaint filter kept {} of {} points ({:.1%} discarded)'.format(
+                    len(candidates), n, 1 - len(candidates) / n))
+
+            if self.workers and self.workers > 1:
+                # Slab hulls in worker processes, merged back together here
+                import parallel_hull
+                t3 = time.time()
+                points = np.column_stack((xs, ys))[candidates]
+                hull = [candidates[i] for i in parallel_hull.parallel_hull(points, self.workers, self.engine)]
+            elif self.engine == 'merge':
+                # Sort the points by increasing x-value O(n log n)
+                order = sort_by_x(xs, candidates)
+                t2 = time.time()
+                print('Time Elapsed (Sorting): {:3.3f} sec'.format(t2-t1))
+                t3 = time.time()
+
+                # Compute the convex hull using divide and conquer O(n log n)
+                hull = convex(xs, ys, order)
+            else:
+                # Other engines do their own ordering, so there is no separate sorting time
+                t3 = time.time()
+                hull = HULL_ENGINES[self.engine](xs, ys, candidates)
+            length = len(hull)
+            t4 = time.time()
+
+            # Pass the convex hull lines back to the GUI for display
+            # This is the convex polygon of all the sorted points O(n)
+            polygon = [QLineF(self.points[hull[i]], self.points[hull[(i + 1) % length]]) for i in range(length)]
+
+            # When passing lines to the display, pass a list of QLineF objects.
+            # Each QLineF object can be created with two QPointF objects corresponding to the endpoints
+            assert (type(polygon) == list and type(polygon[0]) == QLineF)
+
+            # Send a signal to the GUI thread with the hull and its color
+            self.show_hull.emit(polygon, (0, 255, 0))
+
+            # Send a signal to the GUI thread with the time used to compute the hull
+            self.display_text.emit('Time Elapsed (Convex Hull): {:3.3f} sec'.format(t4-t3))
+            print('Time Elapsed (Convex Hull): {:3.3f} sec'.format(t4-t3))
@@ -0,0 +1,95 @@
+import bisect
+
+
+# One side of a dynamic hull, kept as x-sorted parallel lists of coordinates
+# The lower chain is stored as the upper chain of the points mirrored in the x axis, so one set of rules serves both
+# The lists stand in for a balanced tree: finding a position is a bisect, and the inserts and deletes only shift
+# h pointers with one memmove, which beats rebalancing a tree in Python at any hull size a dashboard draws
+class Chain:
+    def __init__(self, sign):
+        self.sign = sign
+        self.xs = []
+        self.ys = []
+
+    # Add a point, returns whether the chain changed O(log h + h), O(log h) when the chain turns it down
+    # Every point is deleted at most once after it was inserted, which pays for the deletion loops,
+    # the h term is the memmove of the splice, which shifts up to h pointers on every insert
+    def add(self, x, y):
+        y *= self.sign
+        xs, ys = self.xs, self.ys
+        i = bisect.bisect_left(xs, x)
+        if i < len(xs) and xs[i] == x:
+            # A point straight below a chain vertex is covered by it, one above replaces it
+            if y <= ys[i]:
+                return False
+            del xs[i]
+            del ys[i]
+        elif 0 < i < len(xs):
+            # Inside the x range a point only joins the chain when it is strictly above the segment under it
+            if (xs[i] - xs[i - 1]) * (y - ys[i - 1]) - (ys[i] - ys[i - 1]) * (x - xs[i - 1]) <= 0:
+                return False
+
+        # Neighbours on or under the segment to the new point are no longer on the chain
+        lo = i
+        while lo >= 2 and (xs[lo - 1] - xs[lo - 2]) * (y - ys[lo - 2]) - (ys[lo - 1] - ys[lo - 2]) * (x - xs[lo - 2]) >= 0:
+            lo -= 1
+        hi = i
+        while hi + 1 < len(xs) and (xs[hi] - x) * (ys[hi + 1] - y) - (ys[hi] - y) * (xs[hi + 1] - x) >= 0:
+            hi += 1
+        xs[lo:hi] = [x]
+        ys[lo:hi] = [y]
+        return True
+
+    # Whether the point is inside the x range of the chain and on or under it O(log h)
+    def covers(self, x, y):
+        y *= self.sign
+        xs, ys = self.xs, self.ys
+        if not xs or x < xs[0] or x > xs[-1]:
+            return False
+        i = bisect.bisect_left(xs, x)
+        if xs[i] == x:
+            return y <= ys[i]
+        return (xs[i] - xs[i - 1]) * (y - ys[i - 1]) - (ys[i] - ys[i - 1]) * (x - xs[i - 1]) <= 0
+
+    # Chain vertices left to right, in the caller's coordinates
+    def points(self):
+        return [(x, y * self.sign) for x, y in zip(self.xs, self.ys)]
+
+
+# Convex hull that grows one point at a time, with upper and lower chains kept separately
+# Asking whether a point is inside costs O(log h), adding one O(log h + h) with the h term a single memmove,
+# no matter how many points came before
+class DynamicHull:
+    def __init__(self, points=()):
+        self.upper = Chain(1)
+        self.lower = Chain(-1)
+        self.extend(points)
+
+    # Add a point, returns whether the hull changed O(log h + h)
+    def add(self, x, y):
+        upper = self.upper.add(x, y)
+        lower = self.lower.add(x, y)
+        return upper or lower
+
+    # Add every (x, y) pair, returns how many of them changed the hull
+    def extend(self, points):
+        return sum(self.add(x, y) for x, y in points)
+
+    # Points on the boundary count as inside O(log h)
+    def __contains__(self, point):
+        x, y = point
+        return self.upper.covers(x, y) and self.lower.covers(x, y)
+
+    # Hull vertices in clockwise order from the leftmost one, the order convex_hull.canonical gives O(h)
+    def vertices(self):
+        upper = self.upper.points()
+        lower = self.lower.points()[::-1]
+        # Both chains end in the leftmost and rightmost points unless two points share that x
+        if lower and lower[0] == upper[-1]:
+            lower = lower[1:]
+        if lower and lower[-1] == upper[0]:
+            lower = lower[:-1]
+        return upper + lower
+
+    def __len__(self):
+        return len(self.vertices())
@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+
+import argparse
+import random
+import sys
+import time
+
+import numpy as np
+
+import convex_hull
+import parallel_hull
+
+# Point counts every engine is timed at
+SIZES = (1000, 10000, 100000, 1000000)
+# Timed runs per engine and size, the fastest run is reported
+REPEAT = 3
+SEED = 0
+# Radius the GUI keeps its points inside
+MAX_R = 0.98
+
+
+# Same draws as Proj2GUI.newPoints, without allocating a QPointF per point
+# Returns an (n, 2) array with distinct x values, as the hull engines expect
+def new_points(n, distribution, rng):
+    points = []
+    unique_xvals = set()
+    while len(points) < n:
+        if distribution == 'uniform':
+            x = rng.uniform(-1.0, 1.0)
+            y = rng.uniform(-1.0, 1.0)
+            inside = x ** 2 + y ** 2 <= MAX_R ** 2
+        elif distribution == 'spherical':
+            x = rng.uniform(-1.0, 1.0)
+            y = rng.uniform(-1.0, 1.0)
+            z = rng.uniform(-1.0, 1.0)
+            inside = x ** 2 + y ** 2 + z ** 2 <= MAX_R ** 2
+        else:
+            x = rng.gauss(0.0, 0.25)
+            y = rng.gauss(0.0, 0.25)
+            inside = x ** 2 + y ** 2 <= MAX_R ** 2
+        if inside and x not in unique_xvals:
+            points.append((x, y))
+            unique_xvals.add(x)
+    return np.array(points, dtype=float).reshape(-1, 2)
+
+
+DISTRIBUTIONS = ('uniform', 'spherical', 'gaussian')
+
+
+# Fastest of repeat runs of one engine, with the hull size it found
+# workers above 1 times the slab hulls of parallel_hull instead of one process
+def time_engine(points, engine, prefilter, repeat, workers=None):
+    best = None
+    for _ in range(repeat):
+        t1 = time.perf_counter()
+        if workers and workers > 1:
+            hull = parallel_hull.parallel_hull(points, workers, engine, prefilter)
+        else:
+            hull = convex_hull.hull_indices(points, prefilter, engine=engine)
+        elapsed = time.perf_counter() - t1
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(hull)
+
+
+def run(sizes, distributions, engines, prefilters, repeat, seed, workers=None):
+    rng = random.Random(seed)
+    print('{:<10}{:>9}{:>6}  {:<8}{:>7}{:>12}{:>10}'.format(
+        'points', 'n', 'h', 'engine', 'filter', 'seconds', 'vs merge'))
+    for distribution in distributions:
+        for n in sizes:
+            points = new_points(n, distribution, rng)
+            for prefilter in prefilters:
+                times = {}
+                for engine in engines:
+                    times[engine], h = time_engine(points, engine, prefilter, repeat, workers)
+                for engine, seconds in times.items():
+                    speedup = '{:.2f}x'.format(times['merge'] / seconds) if 'merge' in times else ''
+                    print('{:<10}{:>9d}{:>6d}  {:<8}{:>7}{:>12.4f}{:>10}'.format(
+                        distribution, n, h, engine, prefilter or '-', seconds, speedup), flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the hull engines on the distributions Proj2GUI generates')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--distributions', nargs='+', choices=DISTRIBUTIONS, default=list(DISTRIBUTIONS))
+    parser.add_argument('--engines', nargs='+', choices=sorted(convex_hull.HULL_ENGINES),
+                        default=list(convex_hull.HULL_ENGINES))
+    parser.add_argument('--prefilter', type=int, nargs='+', choices=(0, 4, 8), default=[0, 8],
+                        help='Akl-Toussaint directions to time with, 0 for no filter')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--workers', type=int, default=None, help='find slab hulls in this many processes')
+    args = parser.parse_args(argv)
+    run(args.sizes, args.distributions, args.engines, args.prefilter, args.repeat, args.seed, args.workers)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
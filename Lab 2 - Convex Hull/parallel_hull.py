@@ -0,0 +1,78 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import convex_hull
+
+# Below this many points the pool costs more than it saves and the hull is found in this process
+PARALLEL_MIN_POINTS = 1 << 16
+
+
+def pool_size(workers):
+    return workers or os.cpu_count() or 1
+
+
+# Worker side: hull of the x-sorted points [lo, hi) of the shared array, as indices into that array
+def slab_hull(name, n, lo, hi, engine, prefilter):
+    block = shared_memory.SharedMemory(name=name)
+    slab = np.ndarray((n, 2), dtype=float, buffer=block.buf)[lo:hi]
+    try:
+        hull = convex_hull.hull_indices(slab, prefilter, engine=engine)
+        return (hull + lo).tolist()
+    finally:
+        # The block cannot be closed while an array still views its buffer
+        del slab
+        block.close()
+
+
+# Merge hulls of x-separated slabs, given left to right, with the divide and conquer merge O(h log P)
+# Only the slab hull vertices are read back, so the merge works on coordinate lists of that size
+def merge_slabs(points, hulls):
+    vertices = [i for hull in hulls for i in hull]
+    xs = points[vertices, 0].tolist()
+    ys = points[vertices, 1].tolist()
+
+    # Slab hulls as lists of positions into vertices, merged pairwise like convex() merges halves
+    pending = []
+    start = 0
+    for hull in hulls:
+        pending.append(list(range(start, start + len(hull))))
+        start += len(hull)
+    while len(pending) > 1:
+        merged = [convex_hull.merge(xs, ys, pending[i], pending[i + 1]) for i in range(0, len(pending) - 1, 2)]
+        if len(pending) % 2:
+            merged.append(pending[-1])
+        pending = merged
+    return [vertices[i] for i in pending[0]]
+
+
+# Indices of the convex hull vertices of an (N, 2) array in clockwise order, found across worker processes
+# The points are sorted by x into one shared memory block and split into one contiguous slab per worker,
+# each worker finds its slab hull with the chosen engine and prefilter, and the slab hulls are merged here
+def parallel_hull(points, workers=None, engine=None, prefilter=None):
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    n = len(points)
+    workers = pool_size(workers)
+    if workers == 1 or n < PARALLEL_MIN_POINTS:
+        return convex_hull.hull_indices(points, prefilter, engine=engine)
+
+    order = np.argsort(points[:, 0], kind='stable')
+    block = shared_memory.SharedMemory(create=True, size=points.nbytes)
+    shared = np.ndarray((n, 2), dtype=float, buffer=block.buf)
+    try:
+        np.take(points, order, axis=0, out=shared)
+
+        bounds = [n * i // workers for i in range(workers + 1)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(slab_hull, block.name, n, lo, hi, engine, prefilter)
+                       for lo, hi in zip(bounds, bounds[1:])]
+            hulls = [future.result() for future in futures]
+
+        hull = merge_slabs(shared, hulls)
+    finally:
+        del shared
+        block.close()
+        block.unlink()
+    return order[hull]
@@ -0,0 +1,107 @@
+import heapq
+
+# Buffer slots under one leaf of the tree, a leaf hull is rebuilt from its slots whenever one of them changes
+LEAF_SIZE = 32
+
+
+# One hull chain through the points of two chains, both given as buffer slots sorted by (x, y) O(h)
+# sign 1 keeps the upper chain and -1 the lower one, both run left to right
+def merge_chain(xs, ys, left, right, sign):
+    chain = []
+    for i in heapq.merge(left, right, key=lambda i: (xs[i], ys[i])):
+        x, y = xs[i], ys[i]
+        while len(chain) >= 2 and sign * ((xs[chain[-1]] - xs[chain[-2]]) * (y - ys[chain[-2]]) -
+                                          (ys[chain[-1]] - ys[chain[-2]]) * (x - xs[chain[-2]])) >= 0:
+            chain.pop()
+        chain.append(i)
+    return chain
+
+
+# Hull of the union of two hulls, each an (upper, lower) pair of chains O(h)
+# The halves of a time window overlap in x, so the tangent merge of convex_hull, which needs the left half
+# entirely left of the right one, cannot join them, merging the x-sorted chains does instead
+def union(xs, ys, a, b):
+    return merge_chain(xs, ys, a[0], b[0], 1), merge_chain(xs, ys, a[1], b[1], -1)
+
+
+EMPTY = ([], [])
+
+
+# Convex hull of the most recent points of a stream, at most window of them
+# Points live in a circular buffer under a tree whose nodes hold the hull of their slots, so adding or evicting
+# a point only rebuilds the O(log window) nodes above its slot, each with one O(h) chain merge
+class SlidingHull:
+    def __init__(self, window, points=()):
+        self.window = window
+        self.xs = [0.0] * window
+        self.ys = [0.0] * window
+        self.start = 0  # Slot of the oldest point
+        self.count = 0
+        self.leaves = -(-window // LEAF_SIZE)
+        # Node i has children 2i and 2i + 1, leaves start at self.leaves, hull union is commutative so the root
+        # covers every leaf even when the number of leaves is not a power of two
+        self.tree = [EMPTY] * (2 * self.leaves)
+        self.extend(points)
+
+    def __len__(self):
+        return self.count
+
+    def live(self, slot):
+        return (slot - self.start) % self.window < self.count
+
+    # Rebuild the hull of one leaf from its live slots O(LEAF_SIZE log LEAF_SIZE)
+    def leaf_hull(self, leaf):
+        lo = leaf * LEAF_SIZE
+        slots = [s for s in range(lo, min(lo + LEAF_SIZE, self.window)) if self.live(s)]
+        slots.sort(key=lambda i: (self.xs[i], self.ys[i]))
+        return merge_chain(self.xs, self.ys, slots, [], 1), merge_chain(self.xs, self.ys, slots, [], -1)
+
+    # Rebuild the given leaves and every node above them, children always before their parent
+    def rebuild(self, leaves):
+        tree = self.tree
+        nodes = set()
+        for leaf in leaves:
+            node = leaf + self.leaves
+            tree[node] = self.leaf_hull(leaf)
+            node //= 2
+            while node and node not in nodes:
+                nodes.add(node)
+                node //= 2
+        for node in sorted(nodes, reverse=True):
+            tree[node] = union(self.xs, self.ys, tree[2 * node], tree[2 * node + 1])
+
+    # Write a point to the next slot, evicting the oldest point once the window is full
+    def write(self, x, y):
+        if self.count == self.window:
+            self.start = (self.start + 1) % self.window
+            self.count -= 1
+        slot = (self.start + self.count) % self.window
+        self.xs[slot] = x
+        self.ys[slot] = y
+        self.count += 1
+        return slot
+
+    # Add the newest point O(h log window)
+    def push(self, x, y):
+        self.rebuild([self.write(x, y) // LEAF_SIZE])
+
+    # Add many points and rebuild each touched node once, which is how a window is filled O(n + h window)
+    def extend(self, points):
+        self.rebuild({self.write(x, y) // LEAF_SIZE for x, y in points})
+
+    # Remove and return the oldest point O(h log window)
+    def evict(self):
+        if not self.count:
+            raise IndexError('evict from an empty window')
+        slot = self.start
+        self.start = (self.start + 1) % self.window
+        self.count -= 1
+        self.rebuild([slot // LEAF_SIZE])
+        return self.xs[slot], self.ys[slot]
+
+    # Hull vertices of the window in clockwise order from the leftmost one, the order convex_hull.canonical gives O(h)
+    def vertices(self):
+        upper, lower = self.tree[1] if self.leaves else EMPTY
+        # Both chains run from the leftmost to the rightmost point, which they share
+        hull = upper + lower[-2:0:-1]
+        return [(self.xs[i], self.ys[i]) for i in hull]
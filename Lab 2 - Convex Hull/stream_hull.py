@@ -0,0 +1,66 @@
+#!/usr/bin/python3
+
+import argparse
+import sys
+
+import numpy as np
+
+import convex_hull
+
+# Points read from the file at a time, memory stays at one chunk plus the running hull
+CHUNK_SIZE = 1 << 20
+# Akl-Toussaint directions every chunk is filtered with before its hull is found
+PREFILTER = 8
+
+
+# Map a flat binary file of native float64 x, y pairs as an (N, 2) array without reading it
+def read_points(path):
+    flat = np.memmap(path, dtype=np.float64, mode='r')
+    if flat.size % 2:
+        raise ValueError('{} does not hold whole (x, y) pairs'.format(path))
+    return flat.reshape(-1, 2)
+
+
+# Indices of the hull vertices of an (N, 2) array or point file, clockwise from the leftmost vertex O(n log h)
+# Each chunk is reduced together with the running hull, so only hull vertices outlive their chunk
+# The result is canonical(points, hull_indices(points)) for the same points held in memory
+def stream_hull(points, chunk_size=CHUNK_SIZE, engine=None, prefilter=PREFILTER):
+    if isinstance(points, str):
+        points = read_points(points)
+    hull = np.empty(0, dtype=np.intp)
+    hull_points = np.empty((0, 2), dtype=float)
+
+    for lo in range(0, len(points), chunk_size):
+        chunk = np.asarray(points[lo:lo + chunk_size], dtype=float)
+        indices = np.concatenate((hull, np.arange(lo, lo + len(chunk), dtype=np.intp)))
+        candidates = np.concatenate((hull_points, chunk))
+        kept = convex_hull.hull_indices(candidates, prefilter, engine=engine)
+        hull = indices[kept]
+        hull_points = candidates[kept]
+
+    return hull[convex_hull.canonical(hull_points, np.arange(len(hull)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convex hull of a binary file of float64 (x, y) pairs')
+    parser.add_argument('path')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='points reduced at a time')
+    parser.add_argument('--engine', choices=sorted(convex_hull.HULL_ENGINES), default=convex_hull.HULL_ENGINE)
+    parser.add_argument('--prefilter', type=int, choices=(0, 4, 8), default=PREFILTER,
+                        help='Akl-Toussaint directions per chunk, 0 for no filter')
+    args = parser.parse_args(argv)
+
+    points = read_points(args.path)
+    hull = stream_hull(points, args.chunk_size, args.engine, args.prefilter)
+    # One tab separated line per hull vertex: index in the file, x, y
+    try:
+        for i in hull:
+            x, y = points[i]
+            sys.stdout.write('{:d}\t{!r}\t{!r}\n'.format(i, float(x), float(y)))
+    except BrokenPipeError:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
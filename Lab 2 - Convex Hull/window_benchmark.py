@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+
+import argparse
+import random
+import sys
+import time
+
+import convex_hull
+import hull_benchmark
+from sliding_hull import SlidingHull
+
+# Window sizes compared
+WINDOWS = (10000, 100000, 1000000)
+# Ticks timed for the sliding hull, each pushes one point and reads the hull
+TICKS = 1000
+# Ticks timed for recomputing, kept low because one tick at a million points takes seconds
+RECOMPUTE_TICKS = 3
+SEED = 0
+
+
+# Seconds per tick of the sliding hull over the points after the first window
+def time_sliding(points, window, ticks):
+    hull = SlidingHull(window, points[:window].tolist())
+    t1 = time.perf_counter()
+    for x, y in points[window:window + ticks].tolist():
+        hull.push(x, y)
+        hull.vertices()
+    return (time.perf_counter() - t1) / ticks
+
+
+# Seconds per tick of finding the hull of the whole window again, the window kept as a circular buffer
+def time_recompute(points, window, ticks, prefilter):
+    buffer = points[:window].copy()
+    t1 = time.perf_counter()
+    for tick in range(ticks):
+        buffer[tick % window] = points[window + tick]
+        convex_hull.hull_indices(buffer, prefilter)
+    return (time.perf_counter() - t1) / ticks
+
+
+def run(windows, distribution, ticks, recompute_ticks, seed):
+    rng = random.Random(seed)
+    print('{:>9}  {:<12}{:>14}{:>12}'.format('window', 'method', 'ms per tick', 'vs sliding'))
+    for window in windows:
+        points = hull_benchmark.new_points(window + max(ticks, recompute_ticks), distribution, rng)
+        sliding = time_sliding(points, window, ticks)
+        results = [
+            ('sliding', sliding),
+            ('recompute', time_recompute(points, window, recompute_ticks, None)),
+            ('recompute+8', time_recompute(points, window, recompute_ticks, 8)),
+        ]
+        for method, seconds in results:
+            print('{:>9d}  {:<12}{:>14.3f}{:>11.0f}x'.format(window, method, seconds * 1000, seconds / sliding),
+                  flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare the sliding window hull with recomputing every tick')
+    parser.add_argument('--windows', type=int, nargs='+', default=WINDOWS)
+    parser.add_argument('--distribution', choices=hull_benchmark.DISTRIBUTIONS, default='gaussian')
+    parser.add_argument('--ticks', type=int, default=TICKS)
+    parser.add_argument('--recompute-ticks', type=int, default=RECOMPUTE_TICKS)
+    parser.add_argument('--seed', type=int, default=SEED)
+    args = parser.parse_args(argv)
+    run(args.windows, args.distribution, args.ticks, args.recompute_ticks, args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())